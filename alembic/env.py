@@ -26,6 +26,13 @@ from app import models  # noqa: F401
 target_metadata = Base.metadata
 
 
+def include_object(obj, name, type_, reflected, compare_to):
+    # The FTS5 table and its shadow tables are managed by app.services.search_service
+    if type_ == "table" and reflected and name.startswith("products_fts"):
+        return False
+    return True
+
+
 def run_migrations_offline() -> None:
     url = DATABASE_URL
     context.configure(
@@ -33,6 +40,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         compare_type=True,
+        include_object=include_object,
         dialect_opts={"paramstyle": "named"},
     )
 
@@ -55,6 +63,7 @@ def run_migrations_online() -> None:
             connection=connection,
             target_metadata=target_metadata,
             compare_type=True,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
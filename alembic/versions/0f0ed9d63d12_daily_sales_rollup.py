@@ -0,0 +1,54 @@
+"""daily sales rollup
+
+Revision ID: 0f0ed9d63d12
+Revises: 265c016a8ba3
+Create Date: 2026-10-17 19:26:38.114052
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0f0ed9d63d12'
+down_revision: Union[str, None] = '265c016a8ba3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_sales',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('discount', sa.Float(), nullable=False),
+    sa.Column('paid_orders', sa.Integer(), nullable=False),
+    sa.Column('paid_revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    # Backfill from existing orders (same statements as rollup_service.rebuild_daily_sales);
+    # cancelled orders are not part of the rollup
+    op.execute(
+        "INSERT INTO daily_sales (day, product_id, orders, units, revenue, discount, paid_orders, paid_revenue) "
+        "SELECT date(o.created_at), 0, count(o.id), coalesce(sum(u.units), 0), coalesce(sum(o.total_amount), 0), "
+        "coalesce(sum(o.discount), 0), count(o.id) FILTER (WHERE o.payment_status = 'paid'), "
+        "coalesce(sum(o.total_amount) FILTER (WHERE o.payment_status = 'paid'), 0) "
+        "FROM orders o LEFT OUTER JOIN (SELECT order_id, sum(quantity) AS units FROM order_items GROUP BY order_id) u ON u.order_id = o.id "
+        "WHERE o.status != 'cancelled' GROUP BY date(o.created_at)"
+    )
+    op.execute(
+        "INSERT INTO daily_sales (day, product_id, orders, units, revenue, discount, paid_orders, paid_revenue) "
+        "SELECT date(o.created_at), oi.product_id, count(DISTINCT o.id), sum(oi.quantity), sum(oi.quantity * oi.unit_price), 0, "
+        "count(DISTINCT o.id) FILTER (WHERE o.payment_status = 'paid'), "
+        "coalesce(sum(oi.quantity * oi.unit_price) FILTER (WHERE o.payment_status = 'paid'), 0) "
+        "FROM orders o JOIN order_items oi ON oi.order_id = o.id "
+        "WHERE o.status != 'cancelled' GROUP BY date(o.created_at), oi.product_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_sales')
@@ -0,0 +1,35 @@
+"""overview counter deltas
+
+Revision ID: 1a3b5d248116
+Revises: b05d4a87cc0b
+Create Date: 2026-10-17 22:05:31.604127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a3b5d248116'
+down_revision: Union[str, None] = 'b05d4a87cc0b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('overview_counter_deltas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('users', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('products', sa.Integer(), nullable=False),
+    sa.Column('active_subscriptions', sa.Integer(), nullable=False),
+    sa.Column('total_subscriptions', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('overview_counter_deltas')
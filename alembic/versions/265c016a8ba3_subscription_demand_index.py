@@ -0,0 +1,26 @@
+"""subscription demand index
+
+Revision ID: 265c016a8ba3
+Revises: 8b251bf923a3
+Create Date: 2026-10-17 18:47:02.551380
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '265c016a8ba3'
+down_revision: Union[str, None] = '8b251bf923a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_subscriptions_demand', 'subscriptions', ['status', 'product_id', 'cadence', 'next_delivery_date', 'quantity'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_subscriptions_demand', table_name='subscriptions')
@@ -0,0 +1,47 @@
+"""product rating aggregates
+
+Revision ID: 3fa16786f61e
+Revises: 7be270d17c06
+Create Date: 2026-10-17 13:48:05.371920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3fa16786f61e'
+down_revision: Union[str, None] = '7be270d17c06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STARS = range(1, 6)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.add_column(sa.Column('rating_avg', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+        for star in STARS:
+            batch_op.add_column(sa.Column(f'rating_{star}', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_products_rating_avg'), 'products', ['rating_avg'], unique=False)
+
+    # Backfill from approved reviews
+    approved = "FROM reviews r WHERE r.product_id = products.id AND r.is_approved = true"
+    star_sets = ", ".join(f"rating_{star} = (SELECT count(*) {approved} AND r.rating = {star})" for star in STARS)
+    op.execute(f"UPDATE products SET rating_count = (SELECT count(*) {approved}), {star_sets}")
+    op.execute(
+        "UPDATE products SET rating_avg = CASE WHEN rating_count > 0 THEN "
+        "(rating_1 + 2 * rating_2 + 3 * rating_3 + 4 * rating_4 + 5 * rating_5) * 1.0 / rating_count ELSE 0 END"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_rating_avg'), table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        for star in STARS:
+            batch_op.drop_column(f'rating_{star}')
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_avg')
@@ -0,0 +1,43 @@
+"""overview counters
+
+Revision ID: 454b49f2e200
+Revises: 0f0ed9d63d12
+Create Date: 2026-10-17 20:03:15.772941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '454b49f2e200'
+down_revision: Union[str, None] = '0f0ed9d63d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('overview_counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('users', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('products', sa.Integer(), nullable=False),
+    sa.Column('active_subscriptions', sa.Integer(), nullable=False),
+    sa.Column('total_subscriptions', sa.Integer(), nullable=False),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Seed the single row from the current tables
+    op.execute(
+        "INSERT INTO overview_counters (id, users, orders, revenue, products, active_subscriptions, total_subscriptions, reconciled_at) SELECT 1, "
+        "(SELECT count(*) FROM users), (SELECT count(*) FROM orders), (SELECT coalesce(sum(total_amount), 0) FROM orders), "
+        "(SELECT count(*) FROM products), (SELECT count(*) FROM subscriptions WHERE status = 'active'), (SELECT count(*) FROM subscriptions), "
+        "CURRENT_TIMESTAMP"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('overview_counters')
@@ -0,0 +1,47 @@
+"""product search index
+
+Revision ID: 7be270d17c06
+Revises: 7fa1bb727dd2
+Create Date: 2026-10-17 11:26:52.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7be270d17c06'
+down_revision: Union[str, None] = '7fa1bb727dd2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(allergens::text, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(ingredients, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(feeding_guidelines, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+            "name, ingredients, feeding_guidelines, allergens, tokenize = 'porter unicode61')"
+        )
+        op.execute(
+            "INSERT INTO products_fts (rowid, name, ingredients, feeding_guidelines, allergens) "
+            "SELECT id, name, coalesce(ingredients, ''), coalesce(feeding_guidelines, ''), coalesce(allergens, '') FROM products"
+        )
+    elif dialect == 'postgresql':
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_products_search ON products USING GIN (({PG_DOCUMENT}))")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS products_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_products_search")
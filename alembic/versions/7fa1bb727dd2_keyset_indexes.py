@@ -0,0 +1,32 @@
+"""keyset indexes
+
+Revision ID: 7fa1bb727dd2
+Revises: c876cd0cd34f
+Create Date: 2026-10-17 10:03:17.550124
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7fa1bb727dd2'
+down_revision: Union[str, None] = 'c876cd0cd34f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_products_created_at'), 'products', ['created_at'], unique=False)
+    op.create_index(op.f('ix_orders_created_at'), 'orders', ['created_at'], unique=False)
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_reviews_product_id_created_at', 'reviews', ['product_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reviews_product_id_created_at', table_name='reviews')
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
+    op.drop_index(op.f('ix_orders_created_at'), table_name='orders')
+    op.drop_index(op.f('ix_products_created_at'), table_name='products')
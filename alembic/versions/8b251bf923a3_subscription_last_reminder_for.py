@@ -0,0 +1,28 @@
+"""subscription last reminder for
+
+Revision ID: 8b251bf923a3
+Revises: d0c2e4d6c52c
+Create Date: 2026-10-17 18:12:54.087316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b251bf923a3'
+down_revision: Union[str, None] = 'd0c2e4d6c52c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('subscriptions') as batch_op:
+        batch_op.add_column(sa.Column('last_reminder_for', sa.Date(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('subscriptions') as batch_op:
+        batch_op.drop_column('last_reminder_for')
@@ -0,0 +1,39 @@
+"""coupon counter shards
+
+Revision ID: 959324e23f1e
+Revises: 656c04d35acf
+Create Date: 2026-10-17 17:05:12.640218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '959324e23f1e'
+down_revision: Union[str, None] = '656c04d35acf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('coupons') as batch_op:
+        batch_op.add_column(sa.Column('high_traffic', sa.Boolean(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('counter_shards', sa.Integer(), server_default='8', nullable=False))
+    op.create_table('coupon_counter_shards',
+    sa.Column('coupon_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('used', sa.Integer(), nullable=False),
+    sa.Column('capacity', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['coupon_id'], ['coupons.id'], ),
+    sa.PrimaryKeyConstraint('coupon_id', 'shard')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('coupon_counter_shards')
+    with op.batch_alter_table('coupons') as batch_op:
+        batch_op.drop_column('counter_shards')
+        batch_op.drop_column('high_traffic')
@@ -0,0 +1,26 @@
+"""product updated_at index
+
+Revision ID: b05d4a87cc0b
+Revises: 454b49f2e200
+Create Date: 2026-10-17 21:12:40.318276
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b05d4a87cc0b'
+down_revision: Union[str, None] = '454b49f2e200'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_products_updated_at'), 'products', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_updated_at'), table_name='products')
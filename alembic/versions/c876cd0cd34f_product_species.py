@@ -0,0 +1,46 @@
+"""product species
+
+Revision ID: c876cd0cd34f
+Revises: 3668b57523a4
+Create Date: 2026-10-17 09:12:41.218305
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c876cd0cd34f'
+down_revision: Union[str, None] = '3668b57523a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    product_species = op.create_table('product_species',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('species', sa.String(length=64), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'species')
+    )
+    op.create_index('ix_product_species_species_product_id', 'product_species', ['species', 'product_id'], unique=False)
+
+    # Backfill from the JSON column
+    conn = op.get_bind()
+    rows = []
+    for product_id, tags in conn.execute(sa.text("SELECT id, species_tags FROM products")):
+        if isinstance(tags, str):
+            tags = json.loads(tags)
+        for species in {(t or "").strip().lower() for t in (tags or [])}:
+            if species:
+                rows.append({"product_id": product_id, "species": species})
+    if rows:
+        op.bulk_insert(product_species, rows)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_species_species_product_id', table_name='product_species')
+    op.drop_table('product_species')
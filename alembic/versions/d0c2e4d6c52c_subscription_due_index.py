@@ -0,0 +1,26 @@
+"""subscription due index
+
+Revision ID: d0c2e4d6c52c
+Revises: 959324e23f1e
+Create Date: 2026-10-17 17:40:27.315904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd0c2e4d6c52c'
+down_revision: Union[str, None] = '959324e23f1e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_subscriptions_status_next_delivery_date', 'subscriptions', ['status', 'next_delivery_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_subscriptions_status_next_delivery_date', table_name='subscriptions')
@@ -10,6 +10,7 @@ from app.auth.jwt_handler import (
     authenticate_user,
     create_access_token,
 )
+from app.services import counters_service as counters
 from app.services.email_service import send_welcome_email
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -22,6 +23,8 @@ def register(user_in: UserCreate, db: Session = Depends(get_db), bg: BackgroundT
         raise HTTPException(status_code=400, detail="Email already registered")
     user = User(email=user_in.email, full_name=user_in.full_name, hashed_password=get_password_hash(user_in.password))
     db.add(user)
+    db.flush()
+    counters.bump(db, users=1)
     db.commit()
     db.refresh(user)
     if bg:
@@ -16,6 +16,15 @@ class Base(DeclarativeBase):
     pass
 
 
+def dialect_insert(db, table):
+    """INSERT construct for the session's backend, so callers can use ON CONFLICT clauses."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -27,4 +36,6 @@ def get_db():
 def init_db():
     # Late import to avoid circulars
     from app import models  # noqa: F401
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    from app.services.search_service import ensure_search_index
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
\ No newline at end of file
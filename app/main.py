@@ -17,6 +17,13 @@ from app.routers.analytics import router as analytics_router
 from app.routers.coupons import router as coupons_router
 from app.routers.payments import router as payments_router
 from app.routers.admin import router as admin_router
+from app.services.background import register_worker, start_workers, stop_workers
+from app.services.counters_service import fold_job as fold_overview_counters, reconcile_job as reconcile_overview_counters
+from app.services.coupon_service import fold_job as fold_coupon_counters
+from app.services.idempotency_service import sweep_job as sweep_idempotency_keys
+from app.services.order_service import auto_cancel_job
+from app.services.reminder_service import reminder_job
+from app.services.rollup_service import fold_job as fold_daily_sales
 
 load_dotenv()
 
@@ -50,4 +57,17 @@ async def health():
 
 @app.on_event("startup")
 def on_startup():
-    init_db()
\ No newline at end of file
+    init_db()
+    register_worker("idempotency-sweep", int(os.getenv("IDEMPOTENCY_SWEEP_SECONDS", "3600")), sweep_idempotency_keys)
+    register_worker("order-auto-cancel", int(os.getenv("AUTO_CANCEL_INTERVAL_SECONDS", "60")), auto_cancel_job)
+    register_worker("coupon-counter-fold", int(os.getenv("COUPON_FOLD_SECONDS", "30")), fold_coupon_counters)
+    register_worker("subscription-reminders", int(os.getenv("REMINDER_INTERVAL_SECONDS", "300")), reminder_job)
+    register_worker("daily-sales-fold", int(os.getenv("ROLLUP_FOLD_SECONDS", "10")), fold_daily_sales)
+    register_worker("overview-counter-fold", int(os.getenv("OVERVIEW_FOLD_SECONDS", "10")), fold_overview_counters)
+    register_worker("overview-reconcile", int(os.getenv("OVERVIEW_RECONCILE_SECONDS", "3600")), reconcile_overview_counters)
+    start_workers()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_workers()
\ No newline at end of file
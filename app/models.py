@@ -2,7 +2,7 @@ from __future__ import annotations
 from datetime import datetime, date
 from typing import List, Optional
 
-from sqlalchemy import Enum, ForeignKey, String, Text, Float, Integer, Boolean, DateTime
+from sqlalchemy import Enum, ForeignKey, String, Text, Float, Integer, Boolean, DateTime, Index, UniqueConstraint
 from sqlalchemy import JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -22,11 +22,18 @@ class OrderStatus(str):
     delivered = "delivered"
 
 
+class ReservationStatus(str):
+    held = "held"
+    committed = "committed"
+    released = "released"
+
+
 class PaymentStatus(str):
     unpaid = "unpaid"
     paid = "paid"
     failed = "failed"
     refunded = "refunded"
+    refund_pending = "refund_pending"  # money received for an order that can no longer be fulfilled
 
 
 class SubscriptionStatus(str):
@@ -95,11 +102,35 @@ class Product(Base):
     feeding_guidelines: Mapped[Optional[str]] = mapped_column(Text)
     storage_instructions: Mapped[Optional[str]] = mapped_column(Text)
     images: Mapped[Optional[List[str]]] = mapped_column(JSON)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Approved-review aggregates, maintained incrementally by the review endpoints
+    rating_avg: Mapped[float] = mapped_column(Float, default=0.0, server_default="0", index=True)
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    rating_1: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    rating_2: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    rating_3: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    rating_4: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    rating_5: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     order_items: Mapped[List["OrderItem"]] = relationship(back_populates="product")
     reviews: Mapped[List["Review"]] = relationship(back_populates="product")
+    species_links: Mapped[List["ProductSpecies"]] = relationship(back_populates="product", cascade="all, delete-orphan")
+
+    @property
+    def rating_histogram(self) -> dict:
+        return {str(star): getattr(self, f"rating_{star}") or 0 for star in range(1, 6)}
+
+
+class ProductSpecies(Base):
+    """Normalized copy of Product.species_tags so species filters can use an index."""
+    __tablename__ = "product_species"
+    __table_args__ = (Index("ix_product_species_species_product_id", "species", "product_id"),)
+
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), primary_key=True)
+    species: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    product: Mapped[Product] = relationship(back_populates="species_links")
 
 
 class Coupon(Base):
@@ -115,10 +146,24 @@ class Coupon(Base):
     used_count: Mapped[int] = mapped_column(Integer, default=0)
     applicable_products: Mapped[Optional[List[int]]] = mapped_column(JSON)
     new_user_only: Mapped[bool] = mapped_column(Boolean, default=False)
+    # High-traffic coupons count redemptions in coupon_counter_shards; used_count is then a periodically folded total
+    high_traffic: Mapped[bool] = mapped_column(Boolean, default=False, server_default="0")
+    counter_shards: Mapped[int] = mapped_column(Integer, default=8, server_default="8")
+
+
+class CouponCounterShard(Base):
+    """One slice of a high-traffic coupon's redemption counter, with its share of max_uses as capacity."""
+    __tablename__ = "coupon_counter_shards"
+
+    coupon_id: Mapped[int] = mapped_column(ForeignKey("coupons.id"), primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+    used: Mapped[int] = mapped_column(Integer, default=0)
+    capacity: Mapped[Optional[int]] = mapped_column(Integer)
 
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (Index("ix_orders_user_id_created_at", "user_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
@@ -128,7 +173,7 @@ class Order(Base):
     shipping_address: Mapped[Optional[dict]] = mapped_column(JSON)
     payment_status: Mapped[str] = mapped_column(String(32), default=PaymentStatus.unpaid)
     tracking_id: Mapped[Optional[str]] = mapped_column(String(64))
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
 
     user: Mapped[User] = relationship(back_populates="orders")
     items: Mapped[List["OrderItem"]] = relationship(back_populates="order", cascade="all, delete-orphan")
@@ -149,6 +194,11 @@ class OrderItem(Base):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index("ix_subscriptions_status_next_delivery_date", "status", "next_delivery_date"),
+        # Covers the demand forecast's grouped scan so it never touches the table
+        Index("ix_subscriptions_demand", "status", "product_id", "cadence", "next_delivery_date", "quantity"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
@@ -161,6 +211,8 @@ class Subscription(Base):
     trial_ends_at: Mapped[Optional[date]] = mapped_column()
     billing_method: Mapped[Optional[str]] = mapped_column(String(32))
     last_payment_status: Mapped[Optional[str]] = mapped_column(String(32))
+    # Delivery date the last reminder was sent for, so reminders survive scheduler restarts
+    last_reminder_for: Mapped[Optional[date]] = mapped_column()
 
     user: Mapped[User] = relationship(back_populates="subscriptions")
     pet: Mapped[Pet] = relationship(back_populates="subscriptions")
@@ -169,6 +221,7 @@ class Subscription(Base):
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (Index("ix_reviews_product_id_created_at", "product_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
@@ -179,4 +232,115 @@ class Review(Base):
     is_approved: Mapped[bool] = mapped_column(Boolean, default=False)
 
     product: Mapped[Product] = relationship(back_populates="reviews")
-    user: Mapped[User] = relationship(back_populates="reviews")
\ No newline at end of file
+    user: Mapped[User] = relationship(back_populates="reviews")
+
+
+class InventoryMovement(Base):
+    """Append-only stock ledger: every change to Product.stock is recorded as a signed quantity."""
+    __tablename__ = "inventory_movements"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
+    quantity: Mapped[int] = mapped_column(Integer)
+    reason: Mapped[str] = mapped_column(String(32))
+    order_id: Mapped[Optional[int]] = mapped_column(ForeignKey("orders.id"), index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class StockReservation(Base):
+    """Stock held for an unpaid order until expires_at; committed on payment, released on cancel or expiry."""
+    __tablename__ = "stock_reservations"
+    __table_args__ = (Index("ix_stock_reservations_status_expires_at", "status", "expires_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), index=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
+    quantity: Mapped[int] = mapped_column(Integer)
+    status: Mapped[str] = mapped_column(String(16), default=ReservationStatus.held)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class Invoice(Base):
+    """Invoice document frozen when the order is paid, stored pre-serialized with its ETag."""
+    __tablename__ = "invoices"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), unique=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    etag: Mapped[str] = mapped_column(String(64))
+    document: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class DailySales(Base):
+    """Per-day sales rollup by product; product_id 0 holds the day's order-level totals (net revenue, discounts).
+
+    Cancelled orders are subtracted, so the rollup covers live orders only.
+    """
+    __tablename__ = "daily_sales"
+
+    day: Mapped[date] = mapped_column(primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    orders: Mapped[int] = mapped_column(Integer, default=0)
+    units: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0.0)
+    discount: Mapped[float] = mapped_column(Float, default=0.0)
+    paid_orders: Mapped[int] = mapped_column(Integer, default=0)
+    paid_revenue: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+class DailySalesDelta(Base):
+    """Append-only change to a daily_sales row, written by order transactions and folded in by a worker."""
+    __tablename__ = "daily_sales_deltas"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column()
+    product_id: Mapped[int] = mapped_column(Integer)
+    orders: Mapped[int] = mapped_column(Integer, default=0)
+    units: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0.0)
+    discount: Mapped[float] = mapped_column(Float, default=0.0)
+    paid_orders: Mapped[int] = mapped_column(Integer, default=0)
+    paid_revenue: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+class OverviewCounters(Base):
+    """Single row (id 1) of running totals for the admin overview, folded from deltas and reconciled periodically."""
+    __tablename__ = "overview_counters"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    users: Mapped[int] = mapped_column(Integer, default=0)
+    orders: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0.0)
+    products: Mapped[int] = mapped_column(Integer, default=0)
+    active_subscriptions: Mapped[int] = mapped_column(Integer, default=0)
+    total_subscriptions: Mapped[int] = mapped_column(Integer, default=0)
+    reconciled_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class OverviewCounterDelta(Base):
+    """Append-only change to the overview counters, written by request transactions and folded in by a worker."""
+    __tablename__ = "overview_counter_deltas"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    users: Mapped[int] = mapped_column(Integer, default=0)
+    orders: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0.0)
+    products: Mapped[int] = mapped_column(Integer, default=0)
+    active_subscriptions: Mapped[int] = mapped_column(Integer, default=0)
+    total_subscriptions: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class IdempotencyKey(Base):
+    """Stored response for a client-supplied Idempotency-Key, replayed on retries."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "scope", "key", name="uq_idempotency_keys_user_scope_key"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    scope: Mapped[str] = mapped_column(String(64))
+    key: Mapped[str] = mapped_column(String(255))
+    fingerprint: Mapped[str] = mapped_column(String(64))
+    response_body: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
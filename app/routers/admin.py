@@ -1,13 +1,19 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.models import User, Product, Order, OrderItem
+from app.models import User, Product, Order
 from app.auth.jwt_handler import get_current_admin
+from app.services.analytics_service import sales_stats as get_sales_stats
+from app.services.background import worker_stats
+from app.services.catalog_service import catalog_cache
+from app.services.coupon_service import coupon_cache
+from app.services.catalog_io_service import export_rows, import_products
+from app.services.order_service import export_orders
 
 router = APIRouter(prefix="/admin", tags=["Admin"]) 
 
@@ -22,11 +28,60 @@ def admin_products(db: Session = Depends(get_db), _: User = Depends(get_current_
     return db.query(Product).order_by(Product.created_at.desc()).all()
 
 
+@router.post("/products/import")
+async def products_import(request: Request, format: str = "ndjson", batch_size: int = 500, db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
+    if format not in {"csv", "ndjson"}:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    return await import_products(db, request.stream(), format, max(min(batch_size, 1000), 1))
+
+
+@router.get("/products/export")
+def products_export(format: str = "ndjson", _: User = Depends(get_current_admin)):
+    if format not in {"csv", "ndjson"}:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(export_rows(format), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=products.{format}"})
+
+
 @router.get("/orders")
 def admin_orders(db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
     return db.query(Order).order_by(Order.created_at.desc()).all()
 
 
+@router.get("/orders/export")
+def orders_export(
+    format: str = "ndjson",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    _: User = Depends(get_current_admin),
+):
+    """Stream orders created in [from, to) for finance and fulfillment."""
+    if format not in {"csv", "ndjson"}:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(export_orders(format, start, end), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=orders.{format}"})
+
+
+def _parse_bound(value: Optional[str], inclusive_day: bool) -> Optional[datetime]:
+    """A YYYY-MM-DD bound covers the whole day; an ISO timestamp is used as-is (UTC)."""
+    if not value:
+        return None
+    try:
+        day = date.fromisoformat(value)
+        return datetime.combine(day + timedelta(days=1) if inclusive_day else day, time.min)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD or ISO timestamps")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
 @router.get("/sales-stats")
 def sales_stats(
     db: Session = Depends(get_db),
@@ -34,44 +89,24 @@ def sales_stats(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     species: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
 ):
-    q = db.query(Order)
-    if start_date:
-        q = q.filter(func.date(Order.created_at) >= start_date)
-    if end_date:
-        q = q.filter(func.date(Order.created_at) <= end_date)
-
-    # Aggregate revenue and count
-    total_orders = q.count()
-    revenue = db.query(func.coalesce(func.sum(Order.total_amount), 0.0))
-    if start_date:
-        revenue = revenue.filter(func.date(Order.created_at) >= start_date)
-    if end_date:
-        revenue = revenue.filter(func.date(Order.created_at) <= end_date)
-    revenue = revenue.scalar() or 0.0
-
-    # Top categories by species (approximate from Product.species_tags)
-    items_q = db.query(Product.name, Product.species_tags, func.sum(OrderItem.quantity).label("sold")) \
-        .join(OrderItem, OrderItem.product_id == Product.id) \
-        .join(Order, OrderItem.order_id == Order.id)
-    if start_date:
-        items_q = items_q.filter(func.date(Order.created_at) >= start_date)
-    if end_date:
-        items_q = items_q.filter(func.date(Order.created_at) <= end_date)
-    items_q = items_q.group_by(Product.id).order_by(func.sum(OrderItem.quantity).desc())
-    items = items_q.limit(10).all()
-
-    if species:
-        items = [i for i in items if i[1] and species in i[1]]
-
-    return {
-        "total_orders": int(total_orders),
-        "revenue": float(revenue),
-        "top_items": [{"name": name, "sold": int(sold)} for name, _, sold in items],
-    }
+    # end_date as a day is inclusive; as a timestamp it is exclusive
+    start, end = _parse_bound(start_date, False), _parse_bound(end_date, True)
+    return get_sales_stats(db, start, end, species, limit)
 
 
 @router.get("/notifications/low-stock")
 def low_stock(db: Session = Depends(get_db), _: User = Depends(get_current_admin), threshold: int = 5):
     items = db.query(Product).filter(Product.stock <= threshold).order_by(Product.stock.asc()).all()
-    return {"low_stock": [{"id": p.id, "name": p.name, "stock": p.stock} for p in items], "threshold": threshold}
\ No newline at end of file
+    return {"low_stock": [{"id": p.id, "name": p.name, "stock": p.stock} for p in items], "threshold": threshold}
+
+
+@router.get("/cache-stats")
+def cache_stats(_: User = Depends(get_current_admin)):
+    return {"catalog": catalog_cache.stats(), "coupons": coupon_cache.stats()}
+
+
+@router.get("/workers")
+def workers(_: User = Depends(get_current_admin)):
+    return worker_stats()
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import User
 from app.auth.jwt_handler import get_current_admin
 from app.services.analytics_service import (
+    demand_forecast,
     get_overview,
     revenue_series,
     top_products,
@@ -37,4 +38,9 @@ def species_trends_view(db: Session = Depends(get_db), _: User = Depends(get_cur
 
 @router.get("/subscription-churn")
 def subscription_churn_view(db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
-    return subscription_churn(db)
\ No newline at end of file
+    return subscription_churn(db)
+
+
+@router.get("/demand-forecast")
+def demand_forecast_view(weeks: int = Query(4, ge=1, le=52), db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
+    return demand_forecast(db, weeks)
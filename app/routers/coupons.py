@@ -1,10 +1,14 @@
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Coupon, User
-from app.schemas import CouponCreate, CouponApplyRequest, CouponValidationResponse
+from app.schemas import CouponBatchCreate, CouponCreate, CouponApplyRequest, CouponValidationResponse
 from app.auth.jwt_handler import get_current_admin, get_current_active_user
+from app.services import coupon_service as coupons
 
 router = APIRouter(prefix="/coupons", tags=["Coupons"]) 
 
@@ -16,34 +20,44 @@ def create_coupon(c_in: CouponCreate, db: Session = Depends(get_db), _: User = D
         raise HTTPException(status_code=400, detail="Code already exists")
     c = Coupon(**c_in.model_dump())
     db.add(c)
+    if c.high_traffic:
+        db.flush()
+        coupons.create_counter_shards(db, c)
     db.commit()
     db.refresh(c)
+    coupons.coupons_changed([c.code])
     return {"id": c.id, "code": c.code}
 
 
+@router.post("/batch")
+def create_coupon_batch(req: CouponBatchCreate, _: User = Depends(get_current_admin)):
+    """Generate many single-campaign codes at once; the codes stream back as CSV."""
+    if len(req.prefix) + req.length > 64:
+        raise HTTPException(status_code=400, detail="prefix and length exceed 64 characters")
+    terms = req.model_dump(exclude={"count", "prefix", "length"})
+    return StreamingResponse(
+        coupons.generate_codes(terms, req.prefix, req.length, req.count),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=coupons.csv"},
+    )
+
+
 @router.get("/validate/{code}", response_model=CouponValidationResponse)
 def validate_coupon(code: str, db: Session = Depends(get_db)):
-    c = db.query(Coupon).filter(Coupon.code == code).first()
-    return CouponValidationResponse(code=code, valid=bool(c), discount_value=(c.discount_value if c else None), discount_type=(c.discount_type if c else None))
+    rule = coupons.get_rule(db, code)
+    if rule is None:
+        return CouponValidationResponse(code=code, valid=False)
+    # used_count is exact for regular coupons and the periodically folded total for high-traffic ones
+    remaining = None
+    if rule.max_uses:
+        used = db.query(Coupon.used_count).filter(Coupon.id == rule.id).scalar() or 0
+        remaining = max(rule.max_uses - used, 0)
+    valid = rule.check(datetime.utcnow().date()) is None and remaining != 0
+    return CouponValidationResponse(code=code, valid=valid, discount_value=rule.discount_value, discount_type=rule.discount_type, remaining_uses=remaining)
 
 
 @router.post("/apply")
-def apply_coupon(req: CouponApplyRequest, db: Session = Depends(get_db), _: User = Depends(get_current_active_user)):
-    c = db.query(Coupon).filter(Coupon.code == req.code).first()
-    if not c:
-        raise HTTPException(status_code=404, detail="Coupon not found")
-    today = c.valid_from or c.valid_to
-    if c.valid_from and today < c.valid_from:
-        raise HTTPException(status_code=400, detail="Coupon not yet valid")
-    if c.valid_to and today > c.valid_to:
-        raise HTTPException(status_code=400, detail="Coupon expired")
-    if c.max_uses and c.used_count >= c.max_uses:
-        raise HTTPException(status_code=400, detail="Coupon usage exceeded")
-    if c.applicable_products and req.product_ids:
-        if not any(pid in c.applicable_products for pid in req.product_ids):
-            raise HTTPException(status_code=400, detail="Coupon not applicable to products")
-    discount = req.amount * (c.discount_value / 100.0) if c.discount_type == "percent" else c.discount_value
-    c.used_count += 1
-    db.add(c)
+def apply_coupon(req: CouponApplyRequest, db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
+    discount = coupons.apply(db, req.code, req.amount, user.id, req.product_ids)
     db.commit()
-    return {"discount": float(min(discount, req.amount))}
\ No newline at end of file
+    return {"discount": float(discount)}
@@ -1,42 +1,58 @@
-from datetime import datetime, timedelta
-from typing import List
+import json
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 
 from app.database import get_db
-from app.models import Order, OrderItem, Product, Coupon, User, OrderStatus, PaymentStatus
-from app.schemas import OrderCreate, OrderOut, OrderStatusUpdate
+from app.models import Invoice, Order, OrderItem, Product, User, OrderStatus, PaymentStatus
+from app.schemas import BulkStatusUpdate, InvoiceBatchRequest, OrderCreate, OrderOut, OrderStatusUpdate
 from app.auth.jwt_handler import get_current_active_user, get_current_admin
+from app.services.catalog_service import stock_changed
+from app.services import counters_service as counters
+from app.services import coupon_service as coupons
+from app.services import idempotency_service as idempotency
+from app.services import inventory_service as inventory
+from app.services import invoice_service as invoices
+from app.services import rollup_service as rollup
 from app.services.email_service import send_order_confirmation
+from app.services.order_service import advance_order, apply_fulfillment_updates, cancel_expired_orders, cancel_orders, serialize_order, serialize_orders
+from app.utils import keyset_page
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
 
-def _apply_coupon(db: Session, amount: float, code: str, product_ids: List[int]) -> float:
-    coupon = db.query(Coupon).filter(Coupon.code == code).first()
-    if not coupon:
+def _apply_coupon(db: Session, amount: float, code: str, user_id: int, product_ids: List[int]) -> float:
+    # An unusable coupon does not fail the order; it just earns no discount
+    try:
+        return coupons.apply(db, code, amount, user_id, product_ids)
+    except HTTPException:
         return 0.0
-    today = datetime.utcnow().date()
-    if coupon.valid_from and today < coupon.valid_from:
-        return 0.0
-    if coupon.valid_to and today > coupon.valid_to:
-        return 0.0
-    if coupon.max_uses and coupon.used_count >= coupon.max_uses:
-        return 0.0
-    if coupon.applicable_products:
-        if not any(pid in coupon.applicable_products for pid in product_ids):
-            return 0.0
-    discount = amount * (coupon.discount_value / 100.0) if coupon.discount_type == "percent" else coupon.discount_value
-    coupon.used_count += 1
-    db.add(coupon)
-    return min(discount, amount)
 
 
 @router.post("/", response_model=OrderOut)
-def create_order(order_in: OrderCreate, db: Session = Depends(get_db), bg: BackgroundTasks = None, user: User = Depends(get_current_active_user)):
+def create_order(
+    order_in: OrderCreate,
+    db: Session = Depends(get_db),
+    bg: BackgroundTasks = None,
+    user: User = Depends(get_current_active_user),
+    response: Response = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    # A retried request with the same key gets the original order back untouched
+    request_fp = idempotency.fingerprint(order_in.model_dump()) if idempotency_key else None
+    if idempotency_key:
+        replay = idempotency.lookup(db, user.id, "orders.create", idempotency_key, request_fp)
+        if replay is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return replay
+
     # Calculate and validate stock
-    product_ids = [i.product_id for i in order_in.items]
+    quantities: Dict[int, int] = {}
+    for it in order_in.items:
+        quantities[it.product_id] = quantities.get(it.product_id, 0) + it.quantity
+    product_ids = list(quantities)
     products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()}
     if len(products) != len(product_ids):
         raise HTTPException(status_code=400, detail="Invalid product(s)")
@@ -45,14 +61,14 @@ def create_order(order_in: OrderCreate, db: Session = Depends(get_db), bg: Backg
     items: List[OrderItem] = []
     for it in order_in.items:
         prod = products[it.product_id]
-        if prod.stock < it.quantity:
+        if prod.stock < quantities[prod.id]:
             raise HTTPException(status_code=400, detail=f"Insufficient stock for product {prod.name}")
         total += prod.price * it.quantity
         items.append(OrderItem(product_id=prod.id, quantity=it.quantity, unit_price=prod.price))
 
     discount = 0.0
     if order_in.coupon_code:
-        discount = _apply_coupon(db, total, order_in.coupon_code, product_ids)
+        discount = _apply_coupon(db, total, order_in.coupon_code, user.id, product_ids)
 
     order = Order(
         user_id=user.id,
@@ -65,71 +81,79 @@ def create_order(order_in: OrderCreate, db: Session = Depends(get_db), bg: Backg
     db.add(order)
     db.flush()  # get order.id
 
-    # Persist items and reduce stock
     for oi in items:
         oi.order_id = order.id
         db.add(oi)
-        prod = products[oi.product_id]
-        prod.stock -= oi.quantity
-        db.add(prod)
 
-    db.commit()
-    db.refresh(order)
+    # Reserve stock last so product row locks are held only until the commit below
+    sold_out = inventory.reserve_stock(db, order.id, quantities)
+    if sold_out is not None:
+        name = products[sold_out].name
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Insufficient stock for product {name}")
+
+    db.flush()
+    rollup.orders_created(db, [order.id])
+    counters.bump(db, orders=1, revenue=order.total_amount)
+    out = serialize_order(order, items)
+    if idempotency_key:
+        idempotency.remember(db, user.id, "orders.create", idempotency_key, request_fp, out)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key committed first; our work is rolled back
+        db.rollback()
+        replay = idempotency.lookup(db, user.id, "orders.create", idempotency_key, request_fp) if idempotency_key else None
+        if replay is None:
+            raise
+        response.headers["Idempotent-Replayed"] = "true"
+        return replay
+    stock_changed(products.keys())
 
     if bg:
         bg.add_task(send_order_confirmation, user.email, order.id)
 
-    return OrderOut(
-        id=order.id,
-        user_id=order.user_id,
-        total_amount=order.total_amount,
-        discount=order.discount,
-        status=order.status,
-        payment_status=order.payment_status,
-        shipping_address=order.shipping_address,
-        tracking_id=order.tracking_id,
-        created_at=order.created_at,
-        items=[{"product_id": oi.product_id, "quantity": oi.quantity, "unit_price": oi.unit_price} for oi in order.items],
-    )
+    return out
+
+
+def _list_orders(q, after: Optional[str], limit: Optional[int], response: Optional[Response]) -> List[dict]:
+    """Newest first; keyset-paged when the client passes limit/after."""
+    if after is None and limit is None:
+        return serialize_orders(q.order_by(Order.created_at.desc(), Order.id.desc()).all())
+    orders, next_cursor = keyset_page(q, Order.created_at, Order.id, True, after, max(min(limit or 20, 100), 1))
+    if next_cursor and response is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return serialize_orders(orders)
 
 
 @router.get("/", response_model=list[OrderOut])
-def list_my_orders(db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
-    orders = db.query(Order).filter(Order.user_id == user.id).order_by(Order.created_at.desc()).all()
-    outs = []
-    for o in orders:
-        outs.append(OrderOut(
-            id=o.id,
-            user_id=o.user_id,
-            total_amount=o.total_amount,
-            discount=o.discount,
-            status=o.status,
-            payment_status=o.payment_status,
-            shipping_address=o.shipping_address,
-            tracking_id=o.tracking_id,
-            created_at=o.created_at,
-            items=[{"product_id": oi.product_id, "quantity": oi.quantity, "unit_price": oi.unit_price} for oi in o.items],
-        ))
-    return outs
+def list_my_orders(db: Session = Depends(get_db), user: User = Depends(get_current_active_user), after: Optional[str] = None, limit: Optional[int] = None, response: Response = None):
+    q = db.query(Order).options(selectinload(Order.items)).filter(Order.user_id == user.id)
+    return _list_orders(q, after, limit, response)
 
 
 @router.get("/{order_id}", response_model=OrderOut)
 def get_order(order_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
-    o = db.query(Order).filter(Order.id == order_id).first()
+    o = db.query(Order).options(selectinload(Order.items)).filter(Order.id == order_id).first()
     if not o or (o.user_id != user.id and user.role != "admin"):
         raise HTTPException(status_code=404, detail="Order not found")
-    return OrderOut(
-        id=o.id,
-        user_id=o.user_id,
-        total_amount=o.total_amount,
-        discount=o.discount,
-        status=o.status,
-        payment_status=o.payment_status,
-        shipping_address=o.shipping_address,
-        tracking_id=o.tracking_id,
-        created_at=o.created_at,
-        items=[{"product_id": oi.product_id, "quantity": oi.quantity, "unit_price": oi.unit_price} for oi in o.items],
-    )
+    return serialize_order(o)
+
+
+@router.patch("/bulk-status")
+def bulk_update_status(req: BulkStatusUpdate, db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
+    """Apply a warehouse manifest of status/tracking updates; invalid rows are reported, not fatal."""
+    return apply_fulfillment_updates(db, req.updates)
+
+
+def _cancel(db: Session, o: Order) -> dict:
+    cancelled, restocked = cancel_orders(db, Order.id == o.id)
+    if not cancelled:
+        raise HTTPException(status_code=400, detail="Cannot cancel this order")
+    db.commit()
+    if restocked:
+        stock_changed(restocked)
+    return {"detail": "Order cancelled"}
 
 
 @router.patch("/{order_id}/status")
@@ -137,9 +161,13 @@ def update_order_status(order_id: int, upd: OrderStatusUpdate, db: Session = Dep
     o = db.query(Order).filter(Order.id == order_id).first()
     if not o:
         raise HTTPException(status_code=404, detail="Order not found")
-    o.status = upd.status
-    db.add(o)
+    if upd.status == OrderStatus.cancelled:
+        return _cancel(db, o)
+    if not advance_order(db, o, upd.status):
+        raise HTTPException(status_code=400, detail=f"Cannot change status from {o.status} to {upd.status}")
     db.commit()
+    if upd.status == OrderStatus.paid:
+        stock_changed(oi.product_id for oi in o.items)
     return {"detail": "Order status updated"}
 
 
@@ -148,71 +176,57 @@ def cancel_order(order_id: int, db: Session = Depends(get_db), user: User = Depe
     o = db.query(Order).filter(Order.id == order_id).first()
     if not o or (o.user_id != user.id and user.role != "admin"):
         raise HTTPException(status_code=404, detail="Order not found")
-    if o.status in [OrderStatus.cancelled, OrderStatus.delivered]:
-        raise HTTPException(status_code=400, detail="Cannot cancel this order")
-    o.status = OrderStatus.cancelled
-    db.add(o)
-    db.commit()
-    return {"detail": "Order cancelled"}
+    return _cancel(db, o)
 
 
 @router.get("/admin/orders", response_model=list[OrderOut])
-def admin_list_orders(db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
-    orders = db.query(Order).order_by(Order.created_at.desc()).all()
-    return [
-        OrderOut(
-            id=o.id,
-            user_id=o.user_id,
-            total_amount=o.total_amount,
-            discount=o.discount,
-            status=o.status,
-            payment_status=o.payment_status,
-            shipping_address=o.shipping_address,
-            tracking_id=o.tracking_id,
-            created_at=o.created_at,
-            items=[{"product_id": oi.product_id, "quantity": oi.quantity, "unit_price": oi.unit_price} for oi in o.items],
-        ) for o in orders
-    ]
+def admin_list_orders(db: Session = Depends(get_db), _: User = Depends(get_current_admin), after: Optional[str] = None, limit: Optional[int] = None, response: Response = None):
+    q = db.query(Order).options(selectinload(Order.items))
+    return _list_orders(q, after, limit, response)
 
 
 @router.post("/auto-cancel")
 def auto_cancel_unpaid(older_than_minutes: int = 60, db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
-    cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
-    q = db.query(Order).filter(
-        Order.status == OrderStatus.pending,
-        Order.payment_status == PaymentStatus.unpaid,
-        Order.created_at < cutoff,
-    )
-    count = 0
-    for o in q.all():
-        o.status = OrderStatus.cancelled
-        db.add(o)
-        count += 1
-    db.commit()
-    return {"cancelled": count, "older_than_minutes": older_than_minutes}
+    result = cancel_expired_orders(db, older_than_minutes)
+    return {**result, "older_than_minutes": older_than_minutes}
+
+
+def _invoice_response(document: str, etag: str, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": f'"{etag}"'}
+    if invoices.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document, media_type="application/json", headers=headers)
+
+
+@router.post("/invoices/batch")
+def get_invoices_batch(req: InvoiceBatchRequest, db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
+    """Fetch many invoices in one call; ids that are unknown or not the caller's are listed under "missing"."""
+    q = db.query(Order).options(selectinload(Order.items)).filter(Order.id.in_(req.order_ids))
+    if user.role != "admin":
+        q = q.filter(Order.user_id == user.id)
+    found = invoices.load_invoices(db, q.order_by(Order.id).all())
+    found_ids = {oid for oid, _, _ in found}
+    missing = [oid for oid in dict.fromkeys(req.order_ids) if oid not in found_ids]
+    # Stored documents are already JSON, so the body is assembled without re-parsing them
+    body = '{"invoices":[' + ",".join(document for _, document, _ in found) + '],"missing":' + json.dumps(missing) + "}"
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{order_id}/invoice")
-def get_invoice(order_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
-    o = db.query(Order).filter(Order.id == order_id).first()
+def get_invoice(
+    order_id: int,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_active_user),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
+    snapshot = db.query(Invoice).filter(Invoice.order_id == order_id).first()
+    if snapshot is not None:
+        if snapshot.user_id != user.id and user.role != "admin":
+            raise HTTPException(status_code=404, detail="Order not found")
+        return _invoice_response(snapshot.document, snapshot.etag, if_none_match)
+    # Not paid yet: render from the live order
+    o = db.query(Order).options(selectinload(Order.items)).filter(Order.id == order_id).first()
     if not o or (o.user_id != user.id and user.role != "admin"):
         raise HTTPException(status_code=404, detail="Order not found")
-    items = [
-        {"product_id": oi.product_id, "quantity": oi.quantity, "unit_price": oi.unit_price, "line_total": round(oi.unit_price * oi.quantity, 2)}
-        for oi in o.items
-    ]
-    subtotal = round(sum(i["line_total"] for i in items), 2)
-    discount = round(o.discount or 0.0, 2)
-    total = round(subtotal - discount, 2)
-    return {
-        "invoice_number": f"INV-{o.id}",
-        "order_id": o.id,
-        "user_id": o.user_id,
-        "status": o.status,
-        "payment_status": o.payment_status,
-        "created_at": o.created_at,
-        "items": items,
-        "subtotal": subtotal,
-        "discount": discount,
-        "total": total,
-    }
\ No newline at end of file
+    document, etag = invoices.render_invoice(o)
+    return _invoice_response(document, etag, if_none_match)
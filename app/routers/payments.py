@@ -1,22 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Order, PaymentStatus, User, OrderStatus
 from app.auth.jwt_handler import get_current_active_user
+from app.services import idempotency_service as idempotency
+from app.services.catalog_service import stock_changed
+from app.services.order_service import mark_paid
 from app.services.payment_service import PaymentService
 
 router = APIRouter(prefix="/payments", tags=["Payments"]) 
 ps = PaymentService()
+logger = logging.getLogger("payments")
 
 
 @router.post("/checkout")
-def checkout(order_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
+def checkout(
+    order_id: int,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_active_user),
+    response: Response = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    request_fp = idempotency.fingerprint({"order_id": order_id}) if idempotency_key else None
+    if idempotency_key:
+        replay = idempotency.lookup(db, user.id, "payments.checkout", idempotency_key, request_fp)
+        if replay is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return replay
     order = db.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     url = ps.create_checkout(order.id, order.total_amount)
-    return {"checkout_url": url}
+    out = {"checkout_url": url}
+    if idempotency_key:
+        idempotency.remember(db, user.id, "payments.checkout", idempotency_key, request_fp, out)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            replay = idempotency.lookup(db, user.id, "payments.checkout", idempotency_key, request_fp)
+            if replay is None:
+                raise
+            response.headers["Idempotent-Replayed"] = "true"
+            return replay
+    return out
 
 
 @router.post("/webhook")
@@ -33,11 +65,21 @@ async def webhook(request: Request, db: Session = Depends(get_db)):
     order = db.query(Order).filter(Order.id == order_id).first()
     if order:
         normalized = status if status in {PaymentStatus.unpaid, PaymentStatus.paid, PaymentStatus.failed, PaymentStatus.refunded} else PaymentStatus.paid
-        order.payment_status = normalized
-        if normalized == PaymentStatus.paid:
-            order.status = OrderStatus.paid
-        db.add(order)
+        if normalized != PaymentStatus.paid:
+            order.payment_status = normalized
+            db.add(order)
+            db.commit()
+            return {"ok": True}
+        claimed = mark_paid(db, order)
+        if not claimed and order.status == OrderStatus.cancelled and order.payment_status in {PaymentStatus.unpaid, PaymentStatus.failed}:
+            # Its stock was already released, so the order is not revived; the payment is
+            # flagged for a manual refund, which the PSP later reports as "refunded"
+            logger.warning("Payment received for cancelled order %s; refund needed", order.id)
+            order.payment_status = PaymentStatus.refund_pending
+            db.add(order)
         db.commit()
+        if claimed:
+            stock_changed(oi.product_id for oi in order.items)
     return {"ok": True}
 
 
@@ -3,8 +3,9 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Pet, User
-from app.schemas import PetCreate, PetUpdate, PetOut
+from app.schemas import PetCreate, PetUpdate, PetOut, PetRecommendations
 from app.auth.jwt_handler import get_current_active_user
+from app.services.recommendation_service import recommendation_index
 from app.utils import suggest_portion_and_meal
 
 router = APIRouter(prefix="/pets", tags=["Pets"])
@@ -42,6 +43,15 @@ def get_pet(pet_id: int, db: Session = Depends(get_db), current_user: User = Dep
     return out
 
 
+@router.get("/{pet_id}/recommendations", response_model=PetRecommendations)
+def get_recommendations(pet_id: int, limit: int = 10, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    pet = db.query(Pet).filter(Pet.id == pet_id).first()
+    if not pet or (pet.user_id != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Pet not found")
+    items = recommendation_index.recommend(db, pet, max(min(limit, 50), 1))
+    return PetRecommendations(pet_id=pet.id, portion_suggestion=suggest_portion_and_meal(pet.weight, pet.activity_level), items=items)
+
+
 @router.put("/{pet_id}", response_model=PetOut)
 def update_pet(pet_id: int, pet_in: PetUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     pet = db.query(Pet).filter(Pet.id == pet_id).first()
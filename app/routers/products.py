@@ -1,14 +1,46 @@
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import and_, case, delete, func, literal, select, union_all
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.models import Product, Review, User
+from app.models import Product, ProductSpecies, Review, User
 from app.schemas import ProductCreate, ProductUpdate, ProductOut, ReviewCreate, ReviewOut
 from app.auth.jwt_handler import get_current_active_user, get_current_admin
+from app.services.catalog_service import (
+    LISTING_TAG,
+    RATING_SORTED_TAG,
+    STOCK_SORTED_TAG,
+    apply_review_rating,
+    catalog_cache,
+    catalog_changed,
+    product_tag,
+    ratings_changed,
+    sync_product_species,
+)
+from app.services import counters_service as counters
+from app.services.inventory_service import delete_product_history, record_movements, reserved_quantity
+from app.services.search_service import index_product, search_product_ids, unindex_product
+from app.utils import keyset_page
 
 router = APIRouter(prefix="/products", tags=["Products"]) 
 
+# Price bands for the storefront facet sidebar: [low, high) with an open top band
+PRICE_BANDS = [(0, 10), (10, 25), (25, 50), (50, 100), (100, None)]
+
+
+def _filter_products(q, species: Optional[str], min_price: Optional[float], max_price: Optional[float], subscription_available: Optional[bool]):
+    if species:
+        tagged = select(ProductSpecies.product_id).where(ProductSpecies.species == species.strip().lower())
+        q = q.filter(Product.id.in_(tagged))
+    if min_price is not None:
+        q = q.filter(Product.price >= min_price)
+    if max_price is not None:
+        q = q.filter(Product.price <= max_price)
+    if subscription_available is not None:
+        q = q.filter(Product.subscription_available == subscription_available)
+    return q
+
 
 @router.post("/", response_model=ProductOut)
 def create_product(prod_in: ProductCreate, db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
@@ -16,9 +48,16 @@ def create_product(prod_in: ProductCreate, db: Session = Depends(get_db), _: Use
     if exists:
         raise HTTPException(status_code=400, detail="Slug already exists")
     product = Product(**prod_in.model_dump())
+    sync_product_species(product)
     db.add(product)
+    db.flush()
+    if product.stock:
+        record_movements(db, [{"product_id": product.id, "quantity": product.stock, "reason": "receipt"}])
+    counters.bump(db, products=1)
+    index_product(db, product)
     db.commit()
     db.refresh(product)
+    catalog_changed([product.id])
     return product
 
 
@@ -33,38 +72,141 @@ def list_products(
     order: Optional[str] = "desc",
     page: int = 1,
     page_size: int = 20,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    response: Response = None,
 ):
-    q = db.query(Product)
-    if min_price is not None:
-        q = q.filter(Product.price >= min_price)
-    if max_price is not None:
-        q = q.filter(Product.price <= max_price)
-    if subscription_available is not None:
-        q = q.filter(Product.subscription_available == subscription_available)
-    if sort_by in {"price", "created_at", "updated_at", "stock"}:
-        col = getattr(Product, sort_by)
-        q = q.order_by(col.desc() if order == "desc" else col.asc())
+    if sort_by in {"price", "created_at", "updated_at", "stock", "rating_avg"}:
+        col, descending = getattr(Product, sort_by), order == "desc"
     else:
-        q = q.order_by(Product.created_at.desc())
-
-    # Fetch and apply species filter in Python for cross-dialect safety
-    items = q.all()
-    if species:
-        items = [p for p in items if p.species_tags and species in p.species_tags]
-
+        col, descending = Product.created_at, True
     page = max(page, 1)
     page_size = max(min(page_size, 100), 1)
-    start = (page - 1) * page_size
-    end = start + page_size
-    return items[start:end]
+    cursor_mode = after is not None or limit is not None
+    limit = max(min(limit or page_size, 100), 1)
+
+    key = ("list", species, min_price, max_price, subscription_available, col.key, descending,
+           ("after", after, limit) if cursor_mode else ("page", page, page_size))
+    cached = catalog_cache.get(key)
+    if cached is None:
+        q = _filter_products(db.query(Product), species, min_price, max_price, subscription_available)
+        next_cursor = None
+        # Cursor mode: ?limit=N for the first page, then ?after=<X-Next-Cursor>
+        if cursor_mode:
+            items, next_cursor = keyset_page(q, col, Product.id, descending, after, limit)
+        else:
+            q = q.order_by(col.desc(), Product.id.desc()) if descending else q.order_by(col.asc(), Product.id.asc())
+            items = q.offset((page - 1) * page_size).limit(page_size).all()
+        cached = ([ProductOut.model_validate(p).model_dump() for p in items], next_cursor)
+        tags = [LISTING_TAG, *(product_tag(p["id"]) for p in cached[0])]
+        if col is Product.stock:
+            tags.append(STOCK_SORTED_TAG)
+        elif col is Product.rating_avg:
+            tags.append(RATING_SORTED_TAG)
+        catalog_cache.set(key, cached, tags)
+
+    items, next_cursor = cached
+    if next_cursor and response is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+
+def _price_band_label(low: float, high: Optional[float]) -> str:
+    return f"{low}-{high}" if high is not None else f"{low}+"
+
+
+@router.get("/facets")
+def product_facets(
+    db: Session = Depends(get_db),
+    species: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    subscription_available: Optional[bool] = None,
+):
+    """Counts per species, price band and subscription flag for the current filters.
+
+    Each facet ignores its own filter (so the sidebar still shows the
+    alternatives); everything comes back from a single UNION ALL query.
+    """
+    key = ("facets", species, min_price, max_price, subscription_available)
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached
+
+    band = case(
+        *[(and_(Product.price >= lo, Product.price < hi), _price_band_label(lo, hi)) for lo, hi in PRICE_BANDS if hi is not None],
+        else_=_price_band_label(*PRICE_BANDS[-1]),
+    )
+    subscription = case((Product.subscription_available == True, "true"), else_="false")
+    total_q = _filter_products(select(literal("total"), literal(""), func.count()).select_from(Product),
+                               species, min_price, max_price, subscription_available)
+    species_q = _filter_products(
+        select(literal("species"), ProductSpecies.species, func.count()).join(Product, Product.id == ProductSpecies.product_id),
+        None, min_price, max_price, subscription_available,
+    ).group_by(ProductSpecies.species)
+    band_q = _filter_products(select(literal("price_band"), band, func.count()).select_from(Product),
+                              species, None, None, subscription_available).group_by(band)
+    sub_q = _filter_products(select(literal("subscription_available"), subscription, func.count()).select_from(Product),
+                             species, min_price, max_price, None).group_by(subscription)
+
+    facets = {"total": 0, "species": {}, "price_band": {}, "subscription_available": {}}
+    for facet, value, count in db.execute(union_all(total_q, species_q, band_q, sub_q)):
+        if facet == "total":
+            facets["total"] = count
+        else:
+            facets[facet][value] = count
+    out = {
+        "total": facets["total"],
+        "species": [{"value": v, "count": c} for v, c in sorted(facets["species"].items(), key=lambda i: (-i[1], i[0]))],
+        "price_bands": [{"value": label, "min": lo, "max": hi, "count": facets["price_band"].get(label, 0)}
+                        for lo, hi in PRICE_BANDS for label in [_price_band_label(lo, hi)]],
+        "subscription_available": [{"value": v == "true", "count": c} for v, c in sorted(facets["subscription_available"].items(), reverse=True)],
+    }
+    catalog_cache.set(key, out, [LISTING_TAG])
+    return out
+
+
+@router.get("/search", response_model=List[ProductOut])
+def search_products(q: str, db: Session = Depends(get_db), limit: int = 20, offset: int = 0):
+    limit = max(min(limit, 100), 1)
+    offset = max(offset, 0)
+    key = ("search", q, limit, offset)
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached
+    ids = search_product_ids(db, q, limit, offset)
+    by_id = {p.id: p for p in db.query(Product).filter(Product.id.in_(ids)).all()} if ids else {}
+    items = [ProductOut.model_validate(by_id[pid]).model_dump() for pid in ids if pid in by_id]
+    catalog_cache.set(key, items, [LISTING_TAG, *(product_tag(p["id"]) for p in items)])
+    return items
 
 
 @router.get("/{product_id}", response_model=ProductOut)
 def get_product(product_id: int, db: Session = Depends(get_db)):
+    cached = catalog_cache.get(("product", product_id))
+    if cached is not None:
+        return cached
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    out = ProductOut.model_validate(product).model_dump()
+    catalog_cache.set(("product", product_id), out, [product_tag(product_id)])
+    return out
+
+
+@router.get("/{product_id}/availability")
+def get_availability(product_id: int, db: Session = Depends(get_db)):
+    """Sellable stock plus what unpaid orders currently hold; cached until the product's stock changes."""
+    key = ("availability", product_id)
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached
+    stock = db.query(Product.stock).filter(Product.id == product_id).scalar()
+    if stock is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    out = {"product_id": product_id, "available": stock, "reserved": reserved_quantity(db, product_id)}
+    catalog_cache.set(key, out, [product_tag(product_id)])
+    return out
 
 
 @router.put("/{product_id}", response_model=ProductOut)
@@ -72,11 +214,18 @@ def update_product(product_id: int, prod_in: ProductUpdate, db: Session = Depend
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    old_stock = product.stock
     for k, v in prod_in.model_dump(exclude_unset=True).items():
         setattr(product, k, v)
+    if product.stock != old_stock:
+        record_movements(db, [{"product_id": product.id, "quantity": (product.stock or 0) - (old_stock or 0), "reason": "adjustment"}])
+    if "species_tags" in prod_in.model_fields_set:
+        sync_product_species(product)
     db.add(product)
+    index_product(db, product)
     db.commit()
     db.refresh(product)
+    catalog_changed([product.id])
     return product
 
 
@@ -85,8 +234,13 @@ def delete_product(product_id: int, db: Session = Depends(get_db), _: User = Dep
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    delete_product_history(db, product_id)
     db.delete(product)
+    unindex_product(db, product_id)
+    db.flush()
+    counters.bump(db, products=-1)
     db.commit()
+    catalog_changed([product_id])
     return {"detail": "Product deleted"}
 
 
@@ -103,8 +257,14 @@ def create_review(product_id: int, review_in: ReviewCreate, db: Session = Depend
 
 
 @router.get("/{product_id}/reviews", response_model=List[ReviewOut])
-def list_reviews(product_id: int, db: Session = Depends(get_db)):
-    return db.query(Review).filter(Review.product_id == product_id, Review.is_approved == True).order_by(Review.created_at.desc()).all()
+def list_reviews(product_id: int, db: Session = Depends(get_db), after: Optional[str] = None, limit: Optional[int] = None, response: Response = None):
+    q = db.query(Review).filter(Review.product_id == product_id, Review.is_approved == True)
+    if after is None and limit is None:
+        return q.order_by(Review.created_at.desc()).all()
+    items, next_cursor = keyset_page(q, Review.created_at, Review.id, True, after, max(min(limit or 20, 100), 1))
+    if next_cursor and response is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 
 @router.patch("/reviews/{review_id}/approve")
@@ -112,7 +272,31 @@ def approve_review(review_id: int, db: Session = Depends(get_db), _: User = Depe
     review = db.query(Review).filter(Review.id == review_id).first()
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
-    review.is_approved = True
-    db.add(review)
+    # Only the request that actually flips the flag counts the rating
+    flipped = db.query(Review).filter(Review.id == review_id, Review.is_approved == False).update(
+        {Review.is_approved: True}, synchronize_session=False
+    )
+    if flipped:
+        apply_review_rating(db, review.product_id, review.rating, 1)
+    db.commit()
+    if flipped:
+        ratings_changed([review.product_id])
+    return {"detail": "Review approved"}
+
+
+@router.delete("/reviews/{review_id}")
+def delete_review(review_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
+    review = db.query(Review).filter(Review.id == review_id).first()
+    if not review or (review.user_id != user.id and user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Review not found")
+    product_id, rating = review.product_id, review.rating
+    # RETURNING reports the approval state at delete time, so a racing approve is not lost
+    was_approved = db.execute(
+        delete(Review).where(Review.id == review_id).returning(Review.is_approved).execution_options(synchronize_session=False)
+    ).scalar()
+    if was_approved:
+        apply_review_rating(db, product_id, rating, -1)
     db.commit()
-    return {"detail": "Review approved"}
\ No newline at end of file
+    if was_approved:
+        ratings_changed([product_id])
+    return {"detail": "Review deleted"}
\ No newline at end of file
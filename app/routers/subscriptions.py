@@ -1,18 +1,21 @@
 from datetime import date, timedelta
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Subscription, Product, Pet, User, Order, OrderItem, SubscriptionStatus, OrderStatus, PaymentStatus
 from app.schemas import SubscriptionCreate, SubscriptionUpdate, SubscriptionOut
-from app.auth.jwt_handler import get_current_active_user
-from app.services.email_service import send_subscription_reminder
+from app.auth.jwt_handler import get_current_active_user, get_current_admin
+from app.services.subscription_service import renew_due_subscriptions
+from app.services import counters_service as counters
+from app.services import rollup_service as rollup
+from app.services.reminder_service import reminder_scheduler
 
 router = APIRouter(prefix="/subscriptions", tags=["Subscriptions"])
 
 
 @router.post("/", response_model=SubscriptionOut)
-def create_subscription(sub_in: SubscriptionCreate, db: Session = Depends(get_db), bg: BackgroundTasks = None, user: User = Depends(get_current_active_user)):
+def create_subscription(sub_in: SubscriptionCreate, db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
     product = db.query(Product).filter(Product.id == sub_in.product_id).first()
     pet = db.query(Pet).filter(Pet.id == sub_in.pet_id, Pet.user_id == user.id).first()
     if not product or not pet:
@@ -28,10 +31,11 @@ def create_subscription(sub_in: SubscriptionCreate, db: Session = Depends(get_db
         status=SubscriptionStatus.active,
     )
     db.add(sub)
+    db.flush()
+    counters.bump(db, total_subscriptions=1, active_subscriptions=1)
     db.commit()
     db.refresh(sub)
-    if bg:
-        bg.add_task(send_subscription_reminder, user.email, sub.id, next_date)
+    reminder_scheduler.schedule(sub.id, next_date, sub.cadence)
     return sub
 
 
@@ -45,11 +49,17 @@ def update_subscription(sub_id: int, sub_in: SubscriptionUpdate, db: Session = D
     sub = db.query(Subscription).filter(Subscription.id == sub_id, Subscription.user_id == user.id).first()
     if not sub:
         raise HTTPException(status_code=404, detail="Subscription not found")
+    was_active = sub.status == SubscriptionStatus.active
     for k, v in sub_in.model_dump(exclude_unset=True).items():
         setattr(sub, k, v)
     db.add(sub)
+    db.flush()
+    counters.bump(db, active_subscriptions=(sub.status == SubscriptionStatus.active) - was_active)
     db.commit()
     db.refresh(sub)
+    if sub.status == SubscriptionStatus.active:
+        # A new cadence moves the reminder deadline; resuming makes it eligible again
+        reminder_scheduler.schedule(sub.id, sub.next_delivery_date, sub.cadence)
     return sub
 
 
@@ -59,10 +69,18 @@ def delete_subscription(sub_id: int, db: Session = Depends(get_db), user: User =
     if not sub:
         raise HTTPException(status_code=404, detail="Subscription not found")
     db.delete(sub)
+    db.flush()
+    counters.bump(db, total_subscriptions=-1, active_subscriptions=-(sub.status == SubscriptionStatus.active))
     db.commit()
     return {"detail": "Subscription cancelled"}
 
 
+@router.post("/renew-due")
+def renew_due(after_id: int = 0, db: Session = Depends(get_db), _: User = Depends(get_current_admin)):
+    """Renew every active subscription due today or earlier; see scripts/renew_subscriptions.py for nightly runs."""
+    return renew_due_subscriptions(db, after_id=after_id)
+
+
 @router.post("/{sub_id}/renew")
 def renew_subscription(sub_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
     sub = db.query(Subscription).filter(Subscription.id == sub_id, Subscription.user_id == user.id).first()
@@ -87,6 +105,9 @@ def renew_subscription(sub_id: int, db: Session = Depends(get_db), user: User =
     db.refresh(order)
     item = OrderItem(order_id=order.id, product_id=product.id, quantity=sub.quantity, unit_price=product.price)
     db.add(item)
+    db.flush()
+    rollup.orders_created(db, [order.id])
+    counters.bump(db, orders=1, revenue=total_amount)
     # advance next delivery date by cadence
     next_date = date.today() + (timedelta(days=7) if sub.cadence == "weekly" else timedelta(days=30))
     sub.next_delivery_date = next_date
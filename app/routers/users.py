@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User
 from app.schemas import UserOut, UserUpdate
+from app.services import counters_service as counters
 from app.auth.jwt_handler import get_current_active_user, get_current_admin
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -37,5 +38,7 @@ def delete_user(user_id: int, db: Session = Depends(get_db), _: User = Depends(g
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     db.delete(user)
+    db.flush()
+    counters.bump(db, users=-1)
     db.commit()
     return {"detail": "User deleted"}
\ No newline at end of file
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import datetime, date
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -85,6 +85,20 @@ class PetOut(PetBase):
     model_config = {"from_attributes": True}
 
 
+class RecommendationItem(BaseModel):
+    product_id: int
+    name: str
+    price: float
+    score: float
+    reasons: List[str]
+
+
+class PetRecommendations(BaseModel):
+    pet_id: int
+    portion_suggestion: Optional[dict] = None
+    items: List[RecommendationItem]
+
+
 class ProductBase(BaseModel):
     name: str
     slug: str
@@ -108,6 +122,7 @@ class ProductCreate(ProductBase):
 
 class ProductUpdate(BaseModel):
     name: Optional[str] = None
+    species_tags: Optional[List[str]] = None
     price: Optional[float] = None
     stock: Optional[int] = None
     subscription_available: Optional[bool] = None
@@ -118,6 +133,9 @@ class ProductUpdate(BaseModel):
 
 class ProductOut(ProductBase):
     id: int
+    rating_avg: float = 0.0
+    rating_count: int = 0
+    rating_histogram: Dict[str, int] = {}
     created_at: datetime
     updated_at: datetime
 
@@ -139,6 +157,16 @@ class OrderStatusUpdate(BaseModel):
     status: str
 
 
+class FulfillmentUpdate(BaseModel):
+    order_id: int
+    status: str
+    tracking_id: Optional[str] = Field(default=None, max_length=64)
+
+
+class BulkStatusUpdate(BaseModel):
+    updates: List[FulfillmentUpdate] = Field(min_length=1, max_length=50000)
+
+
 class OrderOut(BaseModel):
     id: int
     user_id: int
@@ -154,6 +182,10 @@ class OrderOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class InvoiceBatchRequest(BaseModel):
+    order_ids: List[int] = Field(min_length=1, max_length=500)
+
+
 class SubscriptionCreate(BaseModel):
     pet_id: int
     product_id: int
@@ -189,6 +221,21 @@ class CouponCreate(BaseModel):
     max_uses: Optional[int] = None
     applicable_products: Optional[List[int]] = None
     new_user_only: bool = False
+    high_traffic: bool = False
+    counter_shards: int = Field(default=8, ge=1, le=64)
+
+
+class CouponBatchCreate(BaseModel):
+    count: int = Field(gt=0, le=1_000_000)
+    prefix: str = Field(default="", max_length=32)
+    length: int = Field(default=10, ge=6, le=32)
+    discount_type: str
+    discount_value: float
+    valid_from: Optional[date] = None
+    valid_to: Optional[date] = None
+    max_uses: Optional[int] = 1
+    applicable_products: Optional[List[int]] = None
+    new_user_only: bool = False
 
 
 class CouponApplyRequest(BaseModel):
@@ -202,6 +249,7 @@ class CouponValidationResponse(BaseModel):
     valid: bool
     discount_value: Optional[float] = None
     discount_type: Optional[str] = None
+    remaining_uses: Optional[int] = None
 
 
 class ReviewCreate(BaseModel):
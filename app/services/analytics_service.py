@@ -1,38 +1,86 @@
-from typing import Dict, List
-from sqlalchemy import func
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import String, cast, func, select
 from sqlalchemy.orm import Session
 
-from app.models import User, Product, Order, OrderItem, Subscription, Pet
+from app.models import Product, ProductSpecies, Order, OrderItem, Subscription, Pet, Cadence, DailySales, OrderStatus, SubscriptionStatus
+from app.services import counters_service as counters
+from app.services.rollup_service import TOTALS
 
 
 def get_overview(db: Session) -> Dict:
-    total_users = db.query(func.count(User.id)).scalar() or 0
-    total_orders = db.query(func.count(Order.id)).scalar() or 0
-    revenue = db.query(func.coalesce(func.sum(Order.total_amount), 0.0)).scalar() or 0.0
-    active_subs = db.query(func.count(Subscription.id)).scalar() or 0
-    products = db.query(func.count(Product.id)).scalar() or 0
+    c = counters.read(db)
     return {
-        "total_users": total_users,
-        "total_orders": total_orders,
-        "revenue": float(revenue),
-        "active_subscriptions": active_subs,
-        "products": products,
+        "total_users": c.users,
+        "total_orders": c.orders,
+        "revenue": float(c.revenue),
+        "active_subscriptions": c.active_subscriptions,
+        "total_subscriptions": c.total_subscriptions,
+        "products": c.products,
+        "reconciled_at": c.reconciled_at,
     }
 
 
 def revenue_series(db: Session) -> Dict:
-    rows = db.query(func.date(Order.created_at).label("day"), func.coalesce(func.sum(Order.total_amount), 0.0))\
-        .group_by(func.date(Order.created_at)).order_by(func.date(Order.created_at)).all()
+    rows = db.query(DailySales.day, DailySales.revenue).filter(DailySales.product_id == TOTALS).order_by(DailySales.day).all()
     return {"series": [{"day": str(day), "amount": float(amount)} for day, amount in rows]}
 
 
-def top_products(db: Session) -> Dict:
-    rows = db.query(Product.name, func.coalesce(func.sum(OrderItem.quantity), 0))\
-        .join(OrderItem, OrderItem.product_id == Product.id)\
-        .group_by(Product.id).order_by(func.sum(OrderItem.quantity).desc()).limit(10).all()
+def top_products(db: Session, limit: int = 10) -> Dict:
+    sold = func.sum(DailySales.units)
+    rows = db.query(Product.name, sold)\
+        .join(DailySales, DailySales.product_id == Product.id)\
+        .group_by(Product.id).having(sold > 0).order_by(sold.desc()).limit(limit).all()
     return {"items": [{"name": name, "sold": int(sold)} for name, sold in rows]}
 
 
+def _midnight(value: Optional[datetime]) -> bool:
+    return value is None or value.time() == time.min
+
+
+def sales_stats(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                species: Optional[str] = None, limit: int = 10) -> Dict:
+    """Order totals and best sellers for orders created in [start, end), cancelled orders excluded.
+
+    Whole-day ranges are answered from the daily_sales rollup; other bounds
+    range-scan orders on the created_at index.
+    """
+    if _midnight(start) and _midnight(end):
+        in_range = []
+        if start is not None:
+            in_range.append(DailySales.day >= start.date())
+        if end is not None:
+            in_range.append(DailySales.day < end.date())
+        totals = select(func.coalesce(func.sum(DailySales.orders), 0), func.coalesce(func.sum(DailySales.revenue), 0.0))\
+            .where(DailySales.product_id == TOTALS, *in_range)
+        product_id, sold = DailySales.product_id, func.sum(DailySales.units)
+        top = select(Product.name, sold).join(Product, Product.id == product_id).where(*in_range)
+    else:
+        in_range = [Order.status != OrderStatus.cancelled]
+        if start is not None:
+            in_range.append(Order.created_at >= start)
+        if end is not None:
+            in_range.append(Order.created_at < end)
+        totals = select(func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0.0)).where(*in_range)
+        product_id, sold = OrderItem.product_id, func.sum(OrderItem.quantity)
+        top = select(Product.name, sold).join(Order, Order.id == OrderItem.order_id)\
+            .join(Product, Product.id == product_id).where(*in_range)
+
+    if species:
+        tagged = select(ProductSpecies.product_id).where(ProductSpecies.species == species.strip().lower())
+        top = top.where(product_id.in_(tagged))
+    top = top.group_by(Product.id).having(sold > 0).order_by(sold.desc(), Product.id).limit(limit)
+
+    total_orders, revenue = db.execute(totals).one()
+    return {
+        "total_orders": int(total_orders),
+        "revenue": float(revenue),
+        "top_items": [{"name": name, "sold": int(units)} for name, units in db.execute(top)],
+    }
+
+
 def species_trends(db: Session) -> Dict:
     rows = db.query(Pet.species, func.count(Subscription.id))\
         .join(Subscription, Subscription.pet_id == Pet.id)\
@@ -44,4 +92,82 @@ def subscription_churn(db: Session) -> Dict:
     total = db.query(func.count(Subscription.id)).scalar() or 0
     cancelled = db.query(func.count(Subscription.id)).filter(Subscription.status == "cancelled").scalar() or 0
     rate = (cancelled / total) * 100 if total else 0
-    return {"total_subscriptions": total, "cancelled": cancelled, "churn_rate_percent": round(rate, 2)}
\ No newline at end of file
+    return {"total_subscriptions": total, "cancelled": cancelled, "churn_rate_percent": round(rate, 2)}
+
+
+def _positions(sorted_ids: np.ndarray, ids) -> tuple:
+    """Index of each id in sorted_ids, plus a mask of the ids that are present (e.g. not deleted products)."""
+    ids = np.array(ids, dtype=np.int64)
+    idx = np.searchsorted(sorted_ids, ids)
+    known = idx < len(sorted_ids)
+    known[known] = sorted_ids[idx[known]] == ids[known]
+    return idx, known
+
+
+def demand_forecast(db: Session, weeks: int = 4, today: Optional[date] = None, velocity_days: int = 28) -> Dict:
+    """Project per-product unit demand over the next `weeks` and how long current stock covers it.
+
+    Subscriptions are reduced in SQL to (product, cadence, next delivery) groups
+    and projected with array arithmetic; one-off demand is the trailing order
+    velocity minus what the subscriptions themselves ship at steady state.
+    """
+    today = today or date.today()
+    horizon = weeks * 7
+
+    # Columnar snapshot: one array per column, one row per (product, cadence, next delivery date) group
+    groups = db.execute(
+        select(Subscription.product_id, Subscription.cadence, cast(Subscription.next_delivery_date, String), func.sum(Subscription.quantity))
+        .where(Subscription.status == SubscriptionStatus.active, Subscription.next_delivery_date.is_not(None))
+        .group_by(Subscription.product_id, Subscription.cadence, Subscription.next_delivery_date)
+    ).all()
+    products = db.execute(select(Product.id, Product.name, Product.stock).order_by(Product.id)).all()
+    sold = db.execute(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.created_at >= datetime.combine(today - timedelta(days=velocity_days), datetime.min.time()), Order.status != OrderStatus.cancelled)
+        .group_by(OrderItem.product_id)
+    ).all()
+
+    product_ids = np.array([p.id for p in products], dtype=np.int64)
+    stock = np.array([p.stock or 0 for p in products], dtype=np.float64)
+    n = len(product_ids)
+
+    sub_units = np.zeros(n)
+    sub_daily = np.zeros(n)
+    if groups:
+        g_product, g_cadence, g_next, g_qty = zip(*groups)
+        idx, known = _positions(product_ids, g_product)
+        period = np.where(np.array(g_cadence, dtype=object) == Cadence.weekly, 7, 30)
+        qty = np.array(g_qty, dtype=np.float64)
+        # Overdue deliveries count as due today
+        offset = np.maximum((np.array(g_next, dtype="datetime64[D]") - np.datetime64(today, "D")).astype(np.int64), 0)
+        deliveries = np.where(offset < horizon, (horizon - 1 - offset) // period + 1, 0)
+        sub_units = np.bincount(idx[known], weights=(deliveries * qty)[known], minlength=n)
+        sub_daily = np.bincount(idx[known], weights=(qty / period)[known], minlength=n)
+
+    order_daily = np.zeros(n)
+    if sold:
+        s_product, s_qty = zip(*sold)
+        idx, known = _positions(product_ids, s_product)
+        order_daily = np.bincount(idx[known], weights=np.array(s_qty, dtype=np.float64)[known], minlength=n) / velocity_days
+
+    one_off_daily = np.maximum(order_daily - sub_daily, 0)
+    projected = sub_units + one_off_daily * horizon
+    daily = projected / horizon
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coverage = np.where(daily > 0, stock / daily, np.inf)
+
+    order = np.lexsort((product_ids, coverage))
+    items = [
+        {
+            "product_id": int(product_ids[i]),
+            "name": products[i].name,
+            "stock": int(stock[i]),
+            "subscription_units": int(sub_units[i]),
+            "one_off_units_per_day": round(float(one_off_daily[i]), 3),
+            "projected_units": round(float(projected[i]), 1),
+            "coverage_days": round(float(coverage[i]), 1),
+        }
+        for i in order if projected[i] > 0
+    ]
+    return {"weeks": weeks, "horizon_days": horizon, "as_of": str(today), "velocity_days": velocity_days, "items": items}
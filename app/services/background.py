@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.utils import get_env
+
+logger = logging.getLogger("background")
+
+
+class PeriodicWorker:
+    """Runs a job on a daemon thread every interval_seconds and records run statistics."""
+
+    def __init__(self, name: str, interval_seconds: float, job: Callable[[], Any]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.job = job
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_ms: Optional[int] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"worker-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self) -> Any:
+        start = time.perf_counter()
+        self.last_run_at = datetime.utcnow()
+        try:
+            self.last_result = self.job()
+            self.last_error = None
+        except Exception as exc:  # keep the worker alive; surface the error in stats
+            self.failures += 1
+            self.last_error = str(exc)
+            logger.exception("Background job %s failed", self.name)
+        finally:
+            self.runs += 1
+            self.last_duration_ms = int((time.perf_counter() - start) * 1000)
+        return self.last_result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": self.last_duration_ms,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.run_once()
+
+
+workers: Dict[str, PeriodicWorker] = {}
+
+
+def register_worker(name: str, interval_seconds: float, job: Callable[[], Any]) -> PeriodicWorker:
+    worker = workers.get(name)
+    if worker is None:
+        worker = workers[name] = PeriodicWorker(name, interval_seconds, job)
+    return worker
+
+
+def start_workers() -> None:
+    # BACKGROUND_WORKERS=0 disables in-process jobs, e.g. when a separate process runs them
+    if get_env("BACKGROUND_WORKERS", "1") == "0":
+        return
+    for worker in workers.values():
+        worker.start()
+
+
+def stop_workers() -> None:
+    for worker in workers.values():
+        worker.stop()
+
+
+def worker_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: worker.stats() for name, worker in workers.items()}
@@ -0,0 +1,215 @@
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal, dialect_insert
+from app.models import Product, ProductSpecies
+from app.schemas import ProductBase, ProductCreate
+from app.services import counters_service as counters
+from app.services.catalog_service import catalog_reloaded, normalize_species
+from app.services.inventory_service import record_movements
+from app.services.search_service import index_products
+
+PRODUCT_FIELDS = list(ProductBase.model_fields)
+LIST_FIELDS = {"species_tags", "allergens", "images"}
+JSON_FIELDS = {"nutritional_info"}
+MAX_REPORTED_ERRORS = 1000
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (line_no, record, parse_error) for each CSV or NDJSON record."""
+    if fmt == "ndjson":
+        line_no = 0
+        async for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_no, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Expected a JSON object"
+                continue
+            yield line_no, record, None
+        return
+
+    header: Optional[List[str]] = None
+    buffered: List[str] = []
+    line_no = start = 0
+    async for line in lines:
+        line_no += 1
+        if not buffered:
+            start = line_no
+        buffered.append(line)
+        text = "\n".join(buffered)
+        if text.count('"') % 2:
+            continue  # quoted field spans lines
+        buffered = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield start, _from_csv(dict(zip(header, values))), None
+    if buffered:
+        yield start, None, "Unterminated quoted field"
+
+
+def _from_csv(row: Dict[str, str]) -> dict:
+    record = {}
+    for key, value in row.items():
+        if value == "":
+            continue
+        if key in LIST_FIELDS:
+            record[key] = [v.strip() for v in value.split("|") if v.strip()]
+        elif key in JSON_FIELDS:
+            try:
+                record[key] = json.loads(value)
+            except ValueError:
+                record[key] = value  # let validation report it
+        else:
+            record[key] = value
+    return record
+
+
+def upsert_products(db: Session, products: List[ProductCreate]) -> List[int]:
+    """Insert-or-update a batch by slug in one multi-row statement, then refresh ledger, species and search rows."""
+    by_slug = {p.slug: p.model_dump() for p in products}  # last occurrence of a slug wins
+    stock_before = {slug: stock for slug, stock in db.execute(select(Product.slug, Product.stock).where(Product.slug.in_(by_slug)))}
+    now = datetime.utcnow()
+    rows = [{**data, "created_at": now, "updated_at": now} for data in by_slug.values()]
+    table = Product.__table__
+    stmt = dialect_insert(db, table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.slug],
+        set_={name: stmt.excluded[name] for name in [*PRODUCT_FIELDS, "updated_at"] if name != "slug"},
+    ).returning(table.c.id, table.c.slug)
+    ids = {slug: pid for pid, slug in db.execute(stmt)}
+    record_movements(db, [
+        {"product_id": ids[slug], "quantity": data["stock"] - stock_before.get(slug, 0), "reason": "adjustment" if slug in stock_before else "receipt"}
+        for slug, data in by_slug.items()
+        if data["stock"] != stock_before.get(slug, 0)
+    ])
+
+    db.execute(delete(ProductSpecies).where(ProductSpecies.product_id.in_(ids.values())))
+    links = [{"product_id": ids[slug], "species": s} for slug, data in by_slug.items() for s in normalize_species(data.get("species_tags"))]
+    if links:
+        db.execute(ProductSpecies.__table__.insert(), links)
+    index_products(db, [{**data, "id": ids[slug]} for slug, data in by_slug.items()])
+    return list(ids.values())
+
+
+async def import_products(db: Session, chunks: AsyncIterator[bytes], fmt: str, batch_size: int = 500) -> dict:
+    """Validate streamed records and upsert them in batches, committing each batch."""
+    report = {"processed": 0, "upserted": 0, "failed": 0, "errors": []}
+    batch: List[Tuple[int, ProductCreate]] = []
+    async for line_no, record, error in iter_records(iter_lines(chunks), fmt):
+        report["processed"] += 1
+        if error is None:
+            try:
+                batch.append((line_no, ProductCreate.model_validate(record)))
+            except ValidationError as exc:
+                error = validation_message(exc)
+        if error is not None:
+            _record_error(report, line_no, record, error)
+        if len(batch) >= batch_size:
+            await run_in_threadpool(_flush_batch, db, batch, report)
+            batch = []
+    if batch:
+        await run_in_threadpool(_flush_batch, db, batch, report)
+    if report["upserted"]:
+        # Upserts do not tell inserts from updates, so recount once per import
+        await run_in_threadpool(_recount_products, db)
+        catalog_reloaded()
+    return report
+
+
+def _flush_batch(db: Session, batch: List[Tuple[int, ProductCreate]], report: dict) -> None:
+    try:
+        upsert_products(db, [p for _, p in batch])
+        db.commit()
+        report["upserted"] += len(batch)
+    except SQLAlchemyError as exc:
+        db.rollback()
+        message = str(getattr(exc, "orig", None) or exc)
+        for line_no, product in batch:
+            _record_error(report, line_no, {"slug": product.slug}, message)
+
+
+def _recount_products(db: Session) -> None:
+    counters.recount(db, "products")
+    db.commit()
+
+
+def _record_error(report: dict, line_no: int, record: Optional[dict], error: str) -> None:
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"line": line_no, "slug": (record or {}).get("slug"), "error": error})
+
+
+def export_rows(fmt: str) -> Iterator[str]:
+    """Stream the catalog as NDJSON or CSV using a server-side batched fetch."""
+    db = SessionLocal()
+    try:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == "csv":
+            writer.writerow(PRODUCT_FIELDS)
+        rows = db.execute(select(Product).order_by(Product.id.asc()).execution_options(yield_per=1000)).scalars()
+        for p in rows:
+            if fmt == "csv":
+                writer.writerow([_to_csv(name, getattr(p, name)) for name in PRODUCT_FIELDS])
+            else:
+                buf.write(json.dumps({name: getattr(p, name) for name in PRODUCT_FIELDS}))
+                buf.write("\n")
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            db.expunge(p)
+        yield buf.getvalue()
+    finally:
+        db.close()
+
+
+def _to_csv(name: str, value):
+    if value is None:
+        return ""
+    if name in LIST_FIELDS:
+        return "|".join(value)
+    if name in JSON_FIELDS:
+        return json.dumps(value)
+    return value
+
+
+def validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors())
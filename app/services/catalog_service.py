@@ -0,0 +1,89 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session
+
+from app.models import Product, ProductSpecies
+from app.services.recommendation_service import recommendation_index
+from app.utils import TTLCache, get_env
+
+# Per-process read-through cache for product detail and listing results.
+# Write paths invalidate it after commit; the TTL bounds staleness across workers.
+catalog_cache = TTLCache(
+    max_entries=int(get_env("CATALOG_CACHE_MAX", "2048")),
+    ttl_seconds=int(get_env("CATALOG_CACHE_TTL", "60")),
+)
+
+LISTING_TAG = "listing"
+STOCK_SORTED_TAG = "listing:stock"
+RATING_SORTED_TAG = "listing:rating_avg"
+
+
+def product_tag(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def normalize_species(tags: Optional[List[str]]) -> List[str]:
+    seen = []
+    for tag in tags or []:
+        tag = (tag or "").strip().lower()
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def sync_product_species(product: Product) -> None:
+    """Mirror species_tags into product_species; flushed with the product."""
+    wanted = normalize_species(product.species_tags)
+    current = {link.species: link for link in product.species_links}
+    for species, link in current.items():
+        if species not in wanted:
+            product.species_links.remove(link)
+    for species in wanted:
+        if species not in current:
+            product.species_links.append(ProductSpecies(species=species))
+
+
+def apply_review_rating(db: Session, product_id: int, rating: int, delta: int) -> None:
+    """Add (delta=1) or remove (delta=-1) one approved rating from the product's aggregates.
+
+    The average is recomputed from the histogram inside the UPDATE, so
+    concurrent approvals cannot lose increments or accumulate float drift.
+    """
+    stars = [getattr(Product, f"rating_{star}") for star in range(1, 6)]
+    new_count = Product.rating_count + delta
+    new_sum = sum(star * col for star, col in enumerate(stars, start=1)) + delta * rating
+    bucket = stars[rating - 1]
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values({
+            bucket: bucket + delta,
+            Product.rating_count: new_count,
+            Product.rating_avg: case((new_count > 0, new_sum * 1.0 / new_count), else_=0.0),
+            Product.updated_at: Product.updated_at,
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+
+def catalog_changed(product_ids: Iterable[int] = ()) -> None:
+    """Invalidate after a product create/update/delete: any listing may now differ."""
+    product_ids = list(product_ids)
+    catalog_cache.invalidate_tags(LISTING_TAG, *(product_tag(pid) for pid in product_ids))
+    recommendation_index.invalidate(product_ids)
+
+
+def stock_changed(product_ids: Iterable[int]) -> None:
+    """Invalidate after stock moves: only entries showing these products, or sorted by stock."""
+    catalog_cache.invalidate_tags(STOCK_SORTED_TAG, *(product_tag(pid) for pid in product_ids))
+
+
+def ratings_changed(product_ids: Iterable[int]) -> None:
+    catalog_cache.invalidate_tags(RATING_SORTED_TAG, *(product_tag(pid) for pid in product_ids))
+
+
+def catalog_reloaded() -> None:
+    """Drop every cached catalog view after a bulk load."""
+    catalog_cache.clear()
+    recommendation_index.invalidate()
@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, dialect_insert
+from app.models import Order, OverviewCounterDelta, OverviewCounters, Product, Subscription, SubscriptionStatus, User
+
+ROW_ID = 1
+
+# How each counter is computed from scratch
+SOURCES = {
+    "users": lambda: select(func.count(User.id)),
+    "orders": lambda: select(func.count(Order.id)),
+    "revenue": lambda: select(func.coalesce(func.sum(Order.total_amount), 0.0)),
+    "products": lambda: select(func.count(Product.id)),
+    "active_subscriptions": lambda: select(func.count(Subscription.id)).where(Subscription.status == SubscriptionStatus.active),
+    "total_subscriptions": lambda: select(func.count(Subscription.id)),
+}
+
+
+def bump(db: Session, **deltas: float) -> None:
+    """Record deltas inside the caller's transaction.
+
+    This appends a row rather than updating the counters row, so concurrent
+    checkouts and registrations never wait on each other; fold() adds the
+    rows into the counters in the background.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas:
+        db.execute(insert(OverviewCounterDelta).values({**{name: 0 for name in SOURCES}, **deltas}))
+
+
+def _add_pending(db: Session) -> Tuple[int, bool]:
+    """Move pending deltas into the counters row; return (deltas folded, whether the row exists).
+
+    DELETE ... RETURNING hands back exactly the rows it removed, so a delta
+    committed meanwhile is left for the next fold rather than lost.
+    """
+    table = OverviewCounters.__table__
+    rows = db.execute(delete(OverviewCounterDelta).returning(*(getattr(OverviewCounterDelta, name) for name in SOURCES))).all()
+    if not rows:
+        return 0, db.execute(select(table.c.id).where(table.c.id == ROW_ID)).first() is not None
+    sums = [sum(column) for column in zip(*rows)]
+    result = db.execute(update(table).where(table.c.id == ROW_ID).values({name: table.c[name] + value for name, value in zip(SOURCES, sums)}))
+    return len(rows), result.rowcount > 0
+
+
+def fold(db: Session) -> int:
+    """Add pending deltas to the counters row in one transaction; return the deltas folded."""
+    count, exists = _add_pending(db)
+    if not exists:
+        recount(db)  # fresh database: the source tables already include what the deltas describe
+    db.commit()
+    return count
+
+
+def recount(db: Session, *names: str) -> Dict[str, float]:
+    """Recompute the named counters (all by default) from the source tables and store them.
+
+    Pending deltas are folded first, so none of them is applied on top of a
+    recounted value later.
+    """
+    _, exists = _add_pending(db)
+    names = names if names and exists else tuple(SOURCES)
+    values = {name: db.execute(SOURCES[name]()).scalar() or 0 for name in names}
+    if len(names) == len(SOURCES):
+        values["reconciled_at"] = datetime.utcnow()
+    table = OverviewCounters.__table__
+    stmt = dialect_insert(db, table).values({"id": ROW_ID, **{name: 0 for name in SOURCES}, **values})
+    db.execute(stmt.on_conflict_do_update(index_elements=[table.c.id], set_=values))
+    return values
+
+
+def read(db: Session) -> OverviewCounters:
+    """The counters row: one primary-key lookup, current as of the last fold."""
+    row = db.get(OverviewCounters, ROW_ID)
+    if row is None:
+        recount(db)
+        db.commit()
+        row = db.get(OverviewCounters, ROW_ID)
+    return row
+
+
+def fold_job() -> int:
+    db = SessionLocal()
+    try:
+        return fold(db)
+    finally:
+        db.close()
+
+
+def reconcile_job() -> Dict[str, float]:
+    db = SessionLocal()
+    try:
+        values = recount(db)
+        db.commit()
+        return values
+    finally:
+        db.close()
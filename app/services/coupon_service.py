@@ -0,0 +1,201 @@
+import random
+import secrets
+from datetime import date, datetime
+from typing import FrozenSet, Iterable, Iterator, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, dialect_insert
+from app.models import Coupon, CouponCounterShard, Order, OrderStatus
+from app.utils import TTLCache, get_env
+
+# Compiled rules per code. Usage counts are not cached: redemption checks them in SQL.
+coupon_cache = TTLCache(
+    max_entries=int(get_env("COUPON_CACHE_MAX", "4096")),
+    ttl_seconds=int(get_env("COUPON_CACHE_TTL", "300")),
+)
+
+
+def coupon_tag(code: str) -> str:
+    return f"coupon:{code}"
+
+
+class CouponRule:
+    """Immutable, pre-compiled view of a coupon's terms."""
+
+    __slots__ = ("id", "code", "discount_type", "discount_value", "valid_from", "valid_to", "max_uses", "products", "new_user_only",
+                 "high_traffic", "counter_shards")
+
+    def __init__(self, coupon: Coupon):
+        self.id = coupon.id
+        self.code = coupon.code
+        self.discount_type = coupon.discount_type
+        self.discount_value = coupon.discount_value
+        self.valid_from = coupon.valid_from
+        self.valid_to = coupon.valid_to
+        self.max_uses = coupon.max_uses
+        self.products: Optional[FrozenSet[int]] = frozenset(coupon.applicable_products) if coupon.applicable_products else None
+        self.new_user_only = bool(coupon.new_user_only)
+        self.high_traffic = bool(coupon.high_traffic)
+        self.counter_shards = coupon.counter_shards or 1
+
+    def check(self, today: date, product_ids: Optional[Iterable[int]] = None) -> Optional[str]:
+        """Return why the coupon cannot be used, or None if its terms are met."""
+        if self.valid_from and today < self.valid_from:
+            return "Coupon not yet valid"
+        if self.valid_to and today > self.valid_to:
+            return "Coupon expired"
+        if self.products is not None and product_ids and self.products.isdisjoint(product_ids):
+            return "Coupon not applicable to products"
+        return None
+
+    def discount(self, amount: float) -> float:
+        value = amount * (self.discount_value / 100.0) if self.discount_type == "percent" else self.discount_value
+        return min(value, amount)
+
+
+def get_rule(db: Session, code: str) -> Optional[CouponRule]:
+    key = ("coupon", code)
+    rule = coupon_cache.get(key)
+    if rule is None:
+        coupon = db.query(Coupon).filter(Coupon.code == code).first()
+        if coupon is None:
+            return None
+        rule = CouponRule(coupon)
+        coupon_cache.set(key, rule, [coupon_tag(code)])
+    return rule
+
+
+def coupons_changed(codes: Iterable[str]) -> None:
+    coupon_cache.invalidate_tags(*(coupon_tag(code) for code in codes))
+
+
+def is_new_user(db: Session, user_id: int) -> bool:
+    return db.query(Order.id).filter(Order.user_id == user_id, Order.status != OrderStatus.cancelled).first() is None
+
+
+def create_counter_shards(db: Session, coupon: Coupon) -> None:
+    """Split max_uses across the coupon's shards so the shard capacities add up to it exactly."""
+    n = coupon.counter_shards or 1
+    base, extra = divmod(coupon.max_uses, n) if coupon.max_uses else (None, 0)
+    db.execute(CouponCounterShard.__table__.insert(), [
+        {"coupon_id": coupon.id, "shard": i, "used": 0, "capacity": None if base is None else base + (i < extra)}
+        for i in range(n)
+    ])
+
+
+def _redeem_sharded(db: Session, rule: CouponRule) -> bool:
+    # Random shard order spreads concurrent checkouts over different rows; only
+    # when shards run dry does a redemption try more than one.
+    shards = list(range(rule.counter_shards))
+    random.shuffle(shards)
+    for shard in shards:
+        result = db.execute(
+            update(CouponCounterShard)
+            .where(
+                CouponCounterShard.coupon_id == rule.id,
+                CouponCounterShard.shard == shard,
+                or_(CouponCounterShard.capacity.is_(None), CouponCounterShard.used < CouponCounterShard.capacity),
+            )
+            .values(used=CouponCounterShard.used + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            return True
+    return False
+
+
+def redeem(db: Session, rule: CouponRule) -> bool:
+    """Count one use if any remain, in a single conditional UPDATE; return whether it applied.
+
+    A missing or zero max_uses means unlimited, as it always has.
+    """
+    if rule.high_traffic:
+        return _redeem_sharded(db, rule)
+    result = db.execute(
+        update(Coupon)
+        .where(Coupon.id == rule.id, or_(Coupon.max_uses.is_(None), Coupon.max_uses == 0, Coupon.used_count < Coupon.max_uses))
+        .values(used_count=Coupon.used_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def apply(db: Session, code: str, amount: float, user_id: int, product_ids: Optional[Iterable[int]] = None) -> float:
+    """Validate and redeem a coupon in the caller's transaction; return the discount.
+
+    Raises HTTPException when the coupon cannot be used.
+    """
+    rule = get_rule(db, code)
+    if rule is None:
+        raise HTTPException(status_code=404, detail="Coupon not found")
+    error = rule.check(datetime.utcnow().date(), product_ids)
+    if error is None and rule.new_user_only and not is_new_user(db, user_id):
+        error = "Coupon is for new customers only"
+    if error is None and not redeem(db, rule):
+        error = "Coupon usage exceeded"
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return rule.discount(amount)
+
+
+def fold_counters(db: Session) -> int:
+    """Copy the shard totals of high-traffic coupons into used_count in one statement; return the rows updated."""
+    total = (
+        select(func.coalesce(func.sum(CouponCounterShard.used), 0))
+        .where(CouponCounterShard.coupon_id == Coupon.id)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(Coupon).where(Coupon.high_traffic == True).values(used_count=total).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def fold_job() -> int:
+    db = SessionLocal()
+    try:
+        return fold_counters(db)
+    finally:
+        db.close()
+
+
+# 32 unambiguous symbols (no 0/O, 1/I): 256 % 32 == 0, so mapping random bytes onto them is unbiased
+CODE_ALPHABET = b"ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+_CODE_TABLE = bytes(CODE_ALPHABET[b % len(CODE_ALPHABET)] for b in range(256))
+CODE_BATCH_SIZE = 2000
+
+
+def random_codes(prefix: str, length: int, n: int) -> List[str]:
+    raw = secrets.token_bytes(n * length).translate(_CODE_TABLE).decode()
+    return [prefix + raw[i:i + length] for i in range(0, n * length, length)]
+
+
+def generate_codes(terms: dict, prefix: str, length: int, count: int, batch_size: int = CODE_BATCH_SIZE) -> Iterator[str]:
+    """Create count unique coupons sharing the given terms and stream their codes as CSV.
+
+    Each batch is inserted with INSERT ... ON CONFLICT (code) DO NOTHING RETURNING
+    and committed on its own; codes that collided are simply drawn again. A
+    client that disconnects keeps the codes already streamed.
+    """
+    db = SessionLocal()
+    table = Coupon.__table__
+    # Executed with a parameter list, this is sent as multi-row VALUES pages from one cached compilation
+    stmt = dialect_insert(db, table).on_conflict_do_nothing(index_elements=[table.c.code]).returning(table.c.code)
+    try:
+        yield "code\n"
+        remaining = count
+        while remaining:
+            wanted = min(batch_size, remaining)
+            created: List[str] = []
+            while len(created) < wanted:
+                codes = set(random_codes(prefix, length, wanted - len(created)))
+                created.extend(db.execute(stmt, [{**terms, "code": code, "used_count": 0} for code in codes]).scalars())
+            db.commit()
+            remaining -= wanted
+            yield "".join(code + "\n" for code in created)
+    finally:
+        db.close()
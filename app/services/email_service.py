@@ -1,5 +1,6 @@
 import logging
 from datetime import date
+from typing import Iterable, Tuple
 
 logger = logging.getLogger("email_service")
 
@@ -16,5 +17,10 @@ def send_subscription_reminder(email: str, subscription_id: int, next_date: date
     logger.info(f"Subscription {subscription_id} reminder to {email} for {next_date}")
 
 
+def send_subscription_reminders(reminders: Iterable[Tuple[str, int, date]]):
+    for email, subscription_id, next_date in reminders:
+        send_subscription_reminder(email, subscription_id, next_date)
+
+
 def send_low_stock_alert(product_slug: str, remaining: int):
     logger.warning(f"Low stock alert for {product_slug}: {remaining} left")
\ No newline at end of file
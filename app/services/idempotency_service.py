@@ -0,0 +1,67 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+from app.utils import get_env
+
+IDEMPOTENCY_TTL = timedelta(hours=int(get_env("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def lookup(db: Session, user_id: int, scope: str, key: str, request_fingerprint: str) -> Optional[dict]:
+    """Return the stored response for a live key, or None if the request should run.
+
+    Reusing a key with a different request body is a client error.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+    record = db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id, IdempotencyKey.scope == scope, IdempotencyKey.key == key
+    ).first()
+    if record is None:
+        return None
+    if record.created_at < datetime.utcnow() - IDEMPOTENCY_TTL:
+        db.delete(record)
+        db.flush()
+        return None
+    if record.fingerprint != request_fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return json.loads(record.response_body)
+
+
+def remember(db: Session, user_id: int, scope: str, key: str, request_fingerprint: str, body: dict) -> None:
+    """Stage the response in the caller's transaction so it commits together with the work."""
+    db.add(IdempotencyKey(
+        user_id=user_id,
+        scope=scope,
+        key=key,
+        fingerprint=request_fingerprint,
+        response_body=json.dumps(body, separators=(",", ":"), default=str),
+    ))
+
+
+def sweep_expired(db: Session) -> int:
+    cutoff = datetime.utcnow() - IDEMPOTENCY_TTL
+    deleted = db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)).rowcount
+    db.commit()
+    return deleted
+
+
+def sweep_job() -> dict:
+    db = SessionLocal()
+    try:
+        return {"deleted": sweep_expired(db)}
+    finally:
+        db.close()
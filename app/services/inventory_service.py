@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models import InventoryMovement, Product, ReservationStatus, StockReservation
+from app.utils import get_env
+
+# Unpaid orders hold their stock this long before the sweeper cancels them
+RESERVATION_MINUTES = int(get_env("ORDER_PAYMENT_GRACE_MINUTES", "15"))
+
+
+def record_movements(db: Session, movements: List[Dict]) -> None:
+    """Append ledger rows ({product_id, quantity, reason, order_id}) in one executemany insert."""
+    if movements:
+        now = datetime.utcnow()
+        db.execute(InventoryMovement.__table__.insert(), [{"order_id": None, **m, "created_at": now} for m in movements])
+
+
+def reserve_stock(db: Session, order_id: int, quantities: Dict[int, int], minutes: int = RESERVATION_MINUTES) -> Optional[int]:
+    """Hold stock for an order; return the first product that ran out (the caller rolls back).
+
+    Reservation and ledger rows are written before the decrements, so the
+    product rows are locked only for the conditional UPDATEs and the commit
+    that follows. Products are updated in id order so concurrent orders
+    take row locks in the same order; the WHERE clause makes each decrement
+    atomic, so concurrent checkouts cannot oversell.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=minutes)
+    db.execute(StockReservation.__table__.insert(), [
+        {"order_id": order_id, "product_id": pid, "quantity": qty, "status": ReservationStatus.held, "expires_at": expires_at, "created_at": now}
+        for pid, qty in quantities.items()
+    ])
+    record_movements(db, [{"product_id": pid, "quantity": -qty, "reason": "reserve", "order_id": order_id} for pid, qty in quantities.items()])
+    for pid in sorted(quantities):
+        qty = quantities[pid]
+        result = db.execute(
+            update(Product)
+            .where(Product.id == pid, Product.stock >= qty)
+            .values(stock=Product.stock - qty)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return pid
+    return None
+
+
+def commit_reservations(db: Session, order_ids: Iterable[int]) -> None:
+    """Paid orders keep their stock for good; the decrement already happened at reservation time."""
+    db.execute(
+        update(StockReservation)
+        .where(StockReservation.order_id.in_(list(order_ids)), StockReservation.status == ReservationStatus.held)
+        .values(status=ReservationStatus.committed)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_reservations(db: Session, order_ids: Iterable[int]) -> Set[int]:
+    """Return the reserved stock of the given orders in bulk; return the product ids whose stock changed.
+
+    One UPDATE ... RETURNING flips the live reservations, one executemany
+    puts the grouped quantities back and one insert writes the ledger.
+    """
+    released = db.execute(
+        update(StockReservation)
+        .where(
+            StockReservation.order_id.in_(list(order_ids)),
+            StockReservation.status.in_([ReservationStatus.held, ReservationStatus.committed]),
+        )
+        .values(status=ReservationStatus.released)
+        .returning(StockReservation.order_id, StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not released:
+        return set()
+    totals: Dict[int, int] = {}
+    for _, pid, qty in released:
+        totals[pid] = totals.get(pid, 0) + qty
+    products = Product.__table__
+    db.execute(
+        update(products).where(products.c.id == bindparam("pid")).values(stock=products.c.stock + bindparam("qty")),
+        [{"pid": pid, "qty": qty} for pid, qty in totals.items()],
+    )
+    record_movements(db, [{"product_id": pid, "quantity": qty, "reason": "release", "order_id": oid} for oid, pid, qty in released])
+    return set(totals)
+
+
+def delete_product_history(db: Session, product_id: int) -> None:
+    """Drop a product's ledger and reservation rows so the product row itself can be deleted."""
+    db.execute(delete(StockReservation).where(StockReservation.product_id == product_id))
+    db.execute(delete(InventoryMovement).where(InventoryMovement.product_id == product_id))
+
+
+def reserved_quantity(db: Session, product_id: int) -> int:
+    return db.query(func.coalesce(func.sum(StockReservation.quantity), 0)).filter(
+        StockReservation.product_id == product_id, StockReservation.status == ReservationStatus.held
+    ).scalar()
+
+
+def expired_reservation_orders():
+    """Orders with a held reservation past its expiry, as a subquery for the sweeper."""
+    return select(StockReservation.order_id).where(
+        StockReservation.status == ReservationStatus.held, StockReservation.expires_at < datetime.utcnow()
+    )
@@ -0,0 +1,73 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models import Invoice, Order
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def build_invoice(order: Order) -> Dict:
+    items = [
+        {"product_id": oi.product_id, "quantity": oi.quantity, "unit_price": oi.unit_price, "line_total": round(oi.unit_price * oi.quantity, 2)}
+        for oi in order.items
+    ]
+    subtotal = round(sum(i["line_total"] for i in items), 2)
+    discount = round(order.discount or 0.0, 2)
+    return {
+        "invoice_number": f"INV-{order.id}",
+        "order_id": order.id,
+        "user_id": order.user_id,
+        "status": order.status,
+        "payment_status": order.payment_status,
+        "created_at": order.created_at,
+        "items": items,
+        "subtotal": subtotal,
+        "discount": discount,
+        "total": round(subtotal - discount, 2),
+    }
+
+
+def render_invoice(order: Order) -> Tuple[str, str]:
+    """Serialize the invoice compactly; return (document, etag) where the etag is the document's sha256."""
+    document = json.dumps(build_invoice(order), separators=(",", ":"), default=_json_default)
+    return document, hashlib.sha256(document.encode()).hexdigest()
+
+
+def snapshot_invoice(db: Session, order: Order) -> None:
+    """Freeze the order's invoice inside the caller's transaction; an existing snapshot is kept as issued."""
+    document, etag = render_invoice(order)
+    stmt = dialect_insert(db, Invoice.__table__).values(
+        order_id=order.id, user_id=order.user_id, etag=etag, document=document, created_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=[Invoice.__table__.c.order_id])
+    db.execute(stmt)
+
+
+def load_invoices(db: Session, orders: Iterable[Order]) -> List[Tuple[int, str, str]]:
+    """Return (order_id, document, etag) per order: stored snapshots, rendered live for orders not yet paid."""
+    orders = list(orders)
+    stored: Dict[int, Tuple[str, str]] = {
+        oid: (document, etag)
+        for oid, document, etag in db.query(Invoice.order_id, Invoice.document, Invoice.etag).filter(Invoice.order_id.in_([o.id for o in orders]))
+    }
+    out = []
+    for order in orders:
+        document, etag = stored.get(order.id) or render_invoice(order)
+        out.append((order.id, document, etag))
+    return out
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return f'"{etag}"' in {tag.strip() for tag in if_none_match.split(",")}
@@ -0,0 +1,277 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import attrgetter, itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Order, OrderItem, OrderStatus, PaymentStatus
+from app.services import inventory_service as inventory
+from app.services import rollup_service as rollup
+from app.services.catalog_service import stock_changed
+from app.services.invoice_service import snapshot_invoice
+from app.utils import get_env
+
+AUTO_CANCEL_BATCH_SIZE = int(get_env("AUTO_CANCEL_BATCH_SIZE", "500"))
+FULFILLMENT_CHUNK_SIZE = 1000
+
+# Warehouse-driven transitions; shipped -> shipped replaces the tracking id
+FULFILLMENT_TRANSITIONS = {
+    OrderStatus.paid: {OrderStatus.shipped},
+    OrderStatus.shipped: {OrderStatus.shipped, OrderStatus.delivered},
+}
+
+# Column readers resolved once at import instead of per attribute per row
+_order_fields = ("id", "user_id", "total_amount", "discount", "status", "payment_status", "shipping_address", "tracking_id", "created_at")
+_read_order = attrgetter(*_order_fields)
+_read_item = attrgetter("product_id", "quantity", "unit_price")
+
+
+def serialize_items(items: Iterable[OrderItem]) -> List[Dict]:
+    return [{"product_id": pid, "quantity": qty, "unit_price": price} for pid, qty, price in map(_read_item, items)]
+
+
+def serialize_order(order: Order, items: Optional[Iterable[OrderItem]] = None) -> Dict:
+    """OrderOut-shaped dict; pass items when they are not (yet) loaded on order.items."""
+    out = dict(zip(_order_fields, _read_order(order)))
+    out["items"] = serialize_items(order.items if items is None else items)
+    return out
+
+
+def serialize_orders(orders: Iterable[Order]) -> List[Dict]:
+    """Serialize a batch; load it with selectinload(Order.items) so items arrive in one IN query."""
+    return [serialize_order(o) for o in orders]
+
+
+EXPORT_ORDER_COLUMNS = ["order_id", "user_id", "created_at", "status", "payment_status", "total_amount", "discount", "tracking_id"]
+EXPORT_ITEM_COLUMNS = ["product_id", "quantity", "unit_price"]
+
+
+def export_orders(fmt: str, start: Optional[datetime] = None, end: Optional[datetime] = None, flush_bytes: int = 64 * 1024) -> Iterator[str]:
+    """Stream orders in [start, end) as NDJSON (one order per line) or CSV (one line per item).
+
+    Orders and items come from a single joined query fetched in batches, so
+    memory stays flat regardless of how many orders fall in the range.
+    """
+    stmt = (
+        select(Order.id, Order.user_id, Order.created_at, Order.status, Order.payment_status,
+               Order.total_amount, Order.discount, Order.tracking_id,
+               OrderItem.product_id, OrderItem.quantity, OrderItem.unit_price)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.created_at, Order.id, OrderItem.id)
+        .execution_options(yield_per=2000)
+    )
+    if start is not None:
+        stmt = stmt.where(Order.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(Order.created_at < end)
+
+    db = SessionLocal()
+    try:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == "csv":
+            writer.writerow(EXPORT_ORDER_COLUMNS + EXPORT_ITEM_COLUMNS)
+        n_order = len(EXPORT_ORDER_COLUMNS)
+        for _, rows in groupby(db.execute(stmt), key=itemgetter(0)):
+            rows = list(rows)
+            head = rows[0][:n_order]
+            if fmt == "csv":
+                for row in rows:
+                    writer.writerow([*head[:2], head[2].isoformat(), *head[3:], *row[n_order:]])
+            else:
+                record = dict(zip(EXPORT_ORDER_COLUMNS, head))
+                record["created_at"] = head[2].isoformat()
+                record["items"] = [dict(zip(EXPORT_ITEM_COLUMNS, row[n_order:])) for row in rows if row[n_order] is not None]
+                buf.write(json.dumps(record))
+                buf.write("\n")
+            if buf.tell() >= flush_bytes:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+    finally:
+        db.close()
+
+
+def mark_paid(db: Session, order: Order) -> bool:
+    """Claim a pending order as paid; return False when it was not pending. The caller commits.
+
+    The guarded UPDATE makes retried webhooks no-ops and keeps cancelled
+    orders, whose stock is already released, from being revived.
+    """
+    claimed = db.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status == OrderStatus.pending)
+        .values(status=OrderStatus.paid, payment_status=PaymentStatus.paid)
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if claimed is None:
+        return False
+    inventory.commit_reservations(db, [order.id])
+    rollup.orders_paid(db, [order.id])
+    db.refresh(order)
+    snapshot_invoice(db, order)  # the invoice is issued once, at payment time
+    return True
+
+
+def advance_order(db: Session, order: Order, status: str) -> bool:
+    """Move an order forward to paid, shipped or delivered; return False for a disallowed transition.
+
+    Shipping and delivery follow FULFILLMENT_TRANSITIONS with the current
+    status checked in the UPDATE itself. Orders never leave cancelled and
+    never go back to pending. The caller commits.
+    """
+    if status == OrderStatus.paid:
+        return mark_paid(db, order)
+    sources = [old for old, targets in FULFILLMENT_TRANSITIONS.items() if status in targets]
+    if not sources:
+        return False
+    moved = db.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status.in_(sources))
+        .values(status=status)
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    return moved is not None
+
+
+def cancel_orders(db: Session, *criteria) -> Tuple[List[int], Set[int]]:
+    """Cancel the open orders matching criteria; return (cancelled ids, restocked product ids).
+
+    Every cancellation goes through these guarded UPDATE ... RETURNING
+    statements, so an order is taken out of the rollup and has its stock
+    released exactly once. Pending and paid orders get their stock back;
+    shipped orders have left the warehouse and are cancelled without it.
+    The caller commits.
+    """
+    cancelled: List[int] = []
+    restocked: Set[int] = set()
+    for statuses, restock in (([OrderStatus.pending, OrderStatus.paid], True), ([OrderStatus.shipped], False)):
+        ids = db.execute(
+            update(Order)
+            .where(Order.status.in_(statuses), *criteria)
+            .values(status=OrderStatus.cancelled)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if ids and restock:
+            restocked |= inventory.release_reservations(db, ids)
+        cancelled.extend(ids)
+    if cancelled:
+        rollup.orders_cancelled(db, cancelled)
+    return cancelled, restocked
+
+
+def cancel_expired_orders(db: Session, older_than_minutes: Optional[int] = None, batch_size: int = AUTO_CANCEL_BATCH_SIZE) -> Dict:
+    """Cancel pending unpaid orders and release their stock reservations.
+
+    Without older_than_minutes this is the reservation sweeper: orders whose
+    hold has expired are cancelled. Each batch is one UPDATE ... WHERE id IN
+    (oldest N expired) RETURNING id plus a bulk release, committed together.
+    """
+    started = time.perf_counter()
+    if older_than_minutes is None:
+        is_expired = Order.id.in_(inventory.expired_reservation_orders())
+    else:
+        is_expired = Order.created_at < datetime.utcnow() - timedelta(minutes=older_than_minutes)
+    cancelled = batches = 0
+    restocked: Set[int] = set()
+    while True:
+        expired = (
+            select(Order.id)
+            .where(Order.status == OrderStatus.pending, Order.payment_status == PaymentStatus.unpaid, is_expired)
+            .order_by(Order.created_at)
+            .limit(batch_size)
+        )
+        ids, released = cancel_orders(db, Order.id.in_(expired), Order.status == OrderStatus.pending, Order.payment_status == PaymentStatus.unpaid)
+        if not ids:
+            db.rollback()
+            break
+        restocked |= released
+        db.commit()
+        cancelled += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    if restocked:
+        stock_changed(restocked)
+    return {
+        "cancelled": cancelled,
+        "batches": batches,
+        "batch_size": batch_size,
+        "duration_ms": int((time.perf_counter() - started) * 1000),
+    }
+
+
+def apply_fulfillment_updates(db: Session, updates: List, chunk_size: int = FULFILLMENT_CHUNK_SIZE) -> Dict:
+    """Apply {order_id, status, tracking_id} updates in chunked transactions and report per-order failures.
+
+    Each chunk costs one SELECT for the current statuses and one executemany
+    UPDATE guarded by the status that was validated, so an order changed
+    concurrently is reported instead of overwritten.
+    """
+    started = time.perf_counter()
+    orders = Order.__table__
+    stmt = (
+        update(orders)
+        .where(orders.c.id == bindparam("oid"), orders.c.status == bindparam("old_status"))
+        .values(status=bindparam("new_status"), tracking_id=func.coalesce(bindparam("tracking"), orders.c.tracking_id))
+    )
+    updated = chunks = 0
+    failed: List[Dict] = []
+    seen: Set[int] = set()
+    for start in range(0, len(updates), chunk_size):
+        chunk = updates[start:start + chunk_size]
+        current = dict(db.execute(select(orders.c.id, orders.c.status).where(orders.c.id.in_([u.order_id for u in chunk]))).all())
+        params = []
+        for u in chunk:
+            error = None
+            old = current.get(u.order_id)
+            if u.order_id in seen:
+                error = "Duplicate order_id in request"
+            elif old is None:
+                error = "Order not found"
+            elif u.status not in FULFILLMENT_TRANSITIONS.get(old, set()):
+                error = f"Cannot change status from {old} to {u.status}"
+            elif u.status == OrderStatus.shipped and not u.tracking_id:
+                error = "tracking_id is required when shipping"
+            seen.add(u.order_id)
+            if error:
+                failed.append({"order_id": u.order_id, "error": error})
+            else:
+                params.append({"oid": u.order_id, "old_status": old, "new_status": u.status, "tracking": u.tracking_id})
+        if params:
+            result = db.execute(stmt, params)
+            if result.rowcount != len(params):
+                # Some guarded rows moved on since the SELECT; find which ones did not take the update
+                wanted = {p["oid"]: p["new_status"] for p in params}
+                now = dict(db.execute(select(orders.c.id, orders.c.status).where(orders.c.id.in_(wanted))).all())
+                lost = [oid for oid, status in wanted.items() if now.get(oid) != status]
+                failed.extend({"order_id": oid, "error": "Order changed concurrently"} for oid in lost)
+                updated -= len(lost)
+            updated += len(params)
+        db.commit()
+        chunks += 1
+    return {
+        "updated": updated,
+        "failed": failed,
+        "chunks": chunks,
+        "duration_ms": int((time.perf_counter() - started) * 1000),
+    }
+
+
+def auto_cancel_job() -> Dict:
+    db = SessionLocal()
+    try:
+        return cancel_expired_orders(db)
+    finally:
+        db.close()
@@ -0,0 +1,178 @@
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Pet, Product
+from app.utils import get_env
+
+# How often the index checks for catalog writes made by other processes
+RECOMMENDATION_STALE_SECONDS = float(get_env("RECOMMENDATION_STALE_SECONDS", "5"))
+_WORD_RE = re.compile(r"[a-z0-9]+")
+ANY_SPECIES = "*"
+
+
+def _terms(values: Iterable[str]) -> Set[str]:
+    """Whole phrases plus their words, so 'chicken' also matches 'chicken meal'."""
+    terms: Set[str] = set()
+    for value in values:
+        phrase = (value or "").strip().lower()
+        if phrase:
+            terms.add(phrase)
+            terms.update(_WORD_RE.findall(phrase))
+    return terms
+
+
+def _split_ingredients(text: Optional[str]) -> List[str]:
+    return re.split(r"[,;\n]", text or "")
+
+
+class _ProductFacts:
+    __slots__ = ("name", "price", "recommended_age", "species", "allergens", "ingredients", "guidelines")
+
+    def __init__(self, row):
+        self.name = row.name
+        self.price = row.price
+        self.recommended_age = row.recommended_age
+        self.species = {s.strip().lower() for s in (row.species_tags or []) if s and s.strip()} or {ANY_SPECIES}
+        self.allergens = _terms(row.allergens or [])
+        self.ingredients = _terms(_split_ingredients(row.ingredients))
+        self.guidelines = set(_WORD_RE.findall((row.feeding_guidelines or "").lower()))
+
+
+class RecommendationIndex:
+    """In-memory inverted indexes over the catalog for pet recommendations.
+
+    Built once from a single column scan, then patched per product when
+    catalog writes mark ids dirty, so a request only does set algebra.
+    Writes through other worker processes are picked up by a periodic
+    check of max(updated_at) and the row count.
+    """
+
+    _COLUMNS = (Product.id, Product.name, Product.price, Product.recommended_age, Product.species_tags,
+                Product.allergens, Product.ingredients, Product.feeding_guidelines)
+
+    def __init__(self, stale_seconds: float = RECOMMENDATION_STALE_SECONDS):
+        self.stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty: Set[int] = set()
+        self._checked_at = 0.0
+        self._latest: Optional[datetime] = None
+        self.products: Dict[int, _ProductFacts] = {}
+        self.by_species: Dict[str, Set[int]] = {}
+        self.by_allergen: Dict[str, Set[int]] = {}
+        self.by_ingredient: Dict[str, Set[int]] = {}
+
+    def invalidate(self, product_ids: Optional[Iterable[int]] = None) -> None:
+        with self._lock:
+            if product_ids is None:
+                self._loaded = False
+            else:
+                self._dirty.update(product_ids)
+
+    def _sync(self, db: Session) -> None:
+        with self._lock:
+            count = None
+            if not self._loaded or time.monotonic() - self._checked_at >= self.stale_seconds:
+                count = self._check_version(db)
+            if not self._loaded:
+                self._reload(db)
+            elif self._dirty:
+                ids, self._dirty = self._dirty, set()
+                for pid in ids:
+                    self._remove(pid)
+                for row in db.query(*self._COLUMNS).filter(Product.id.in_(ids)):
+                    self._add(row.id, _ProductFacts(row))
+            if count is not None and count != len(self.products):
+                # Rows deleted elsewhere leave no updated_at behind, so rebuild
+                self._reload(db)
+
+    def _reload(self, db: Session) -> None:
+        self.products, self.by_species, self.by_allergen, self.by_ingredient = {}, {}, {}, {}
+        self._dirty.clear()
+        for row in db.query(*self._COLUMNS).yield_per(1000):
+            self._add(row.id, _ProductFacts(row))
+        self._loaded = True
+
+    def _check_version(self, db: Session) -> int:
+        """Mark rows written since the last check dirty; return the current row count."""
+        latest, count = db.execute(select(func.max(Product.updated_at), func.count(Product.id))).one()
+        if self._loaded and latest is not None and latest != self._latest:
+            since = select(Product.id)
+            if self._latest is not None:
+                since = since.where(Product.updated_at >= self._latest)
+            self._dirty.update(db.scalars(since))
+        self._latest, self._checked_at = latest, time.monotonic()
+        return count
+
+    def _add(self, pid: int, facts: _ProductFacts) -> None:
+        self.products[pid] = facts
+        for index, keys in ((self.by_species, facts.species), (self.by_allergen, facts.allergens), (self.by_ingredient, facts.ingredients)):
+            for key in keys:
+                index.setdefault(key, set()).add(pid)
+
+    def _remove(self, pid: int) -> None:
+        facts = self.products.pop(pid, None)
+        if facts is None:
+            return
+        for index, keys in ((self.by_species, facts.species), (self.by_allergen, facts.allergens), (self.by_ingredient, facts.ingredients)):
+            for key in keys:
+                bucket = index.get(key)
+                if bucket is not None:
+                    bucket.discard(pid)
+                    if not bucket:
+                        del index[key]
+
+    def recommend(self, db: Session, pet: Pet, limit: int = 10) -> List[Dict]:
+        """Return products safe for the pet, best first, with their score and reasons."""
+        self._sync(db)
+        with self._lock:
+            candidates = self.by_species.get((pet.species or "").strip().lower(), set()) | self.by_species.get(ANY_SPECIES, set())
+            for allergy in _terms(pet.allergies or []):
+                candidates = candidates - self.by_allergen.get(allergy, set()) - self.by_ingredient.get(allergy, set())
+
+            preferred = _terms(pet.preferred_ingredients or [])
+            conditions = _terms(pet.health_conditions or [])
+            hits: Dict[int, List[str]] = {}
+            for term in preferred:
+                for pid in self.by_ingredient.get(term, set()) & candidates:
+                    hits.setdefault(pid, []).append(term)
+
+            scored = []
+            for pid in candidates:
+                facts = self.products[pid]
+                reasons = [f"contains {t}" for t in sorted(hits.get(pid, []))]
+                score = 3.0 * len(reasons)
+                if pet.age is not None and facts.recommended_age is not None:
+                    gap = abs(pet.age - facts.recommended_age)
+                    if gap <= 1:
+                        score += 2.0
+                        reasons.append("age appropriate")
+                    else:
+                        score -= min(gap, 5) * 0.5
+                matched = conditions & facts.guidelines
+                if matched:
+                    score += len(matched)
+                    reasons.append("addresses " + ", ".join(sorted(matched)))
+                scored.append({"product_id": pid, "name": facts.name, "price": facts.price, "score": round(score, 2), "reasons": reasons})
+
+        scored.sort(key=lambda r: (-r["score"], r["product_id"]))
+        # Stock is volatile, so it is checked on shortlists only (primary-key lookups)
+        results: List[Dict] = []
+        window = max(limit, 1) * 3
+        for start in range(0, len(scored), window):
+            shortlist = scored[start:start + window]
+            ids = [r["product_id"] for r in shortlist]
+            in_stock = {pid for pid, stock in db.query(Product.id, Product.stock).filter(Product.id.in_(ids)) if stock and stock > 0}
+            results.extend(r for r in shortlist if r["product_id"] in in_stock)
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+
+recommendation_index = RecommendationIndex()
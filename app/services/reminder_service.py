@@ -0,0 +1,149 @@
+import heapq
+import threading
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Cadence, Subscription, SubscriptionStatus, User
+from app.services.email_service import send_subscription_reminders
+from app.utils import get_env
+
+# How many days before a delivery its reminder goes out
+REMINDER_LEAD = {Cadence.weekly: timedelta(days=2), Cadence.monthly: timedelta(days=5)}
+MAX_LEAD = max(REMINDER_LEAD.values())
+REMINDER_BATCH_SIZE = int(get_env("REMINDER_BATCH_SIZE", "500"))
+REMINDER_HEAP_CAPACITY = int(get_env("REMINDER_HEAP_CAPACITY", "50000"))
+
+
+def reminder_deadline(next_delivery_date: date, cadence: Optional[str]) -> date:
+    return next_delivery_date - REMINDER_LEAD.get(cadence, REMINDER_LEAD[Cadence.monthly])
+
+
+def due_by(today: date):
+    """SQL predicate: the reminder deadline has passed, with each cadence's own lead time."""
+    default = REMINDER_LEAD[Cadence.monthly]
+    explicit = [cadence for cadence, lead in REMINDER_LEAD.items() if lead != default]
+    return or_(
+        *(and_(Subscription.cadence == cadence, Subscription.next_delivery_date <= today + REMINDER_LEAD[cadence]) for cadence in explicit),
+        and_(or_(Subscription.cadence.is_(None), Subscription.cadence.notin_(explicit)), Subscription.next_delivery_date <= today + default),
+    )
+
+
+class ReminderScheduler:
+    """Min-heap of upcoming subscription reminders, refilled from the database in windows.
+
+    Refills walk the (status, next_delivery_date) index with a keyset cursor,
+    so each subscription is read once per day rather than polled. Sent
+    reminders are recorded in Subscription.last_reminder_for; a restarted
+    process rebuilds the heap from the same query and skips them.
+    """
+
+    def __init__(self, sender: Callable = send_subscription_reminders, batch_size: int = REMINDER_BATCH_SIZE,
+                 capacity: int = REMINDER_HEAP_CAPACITY):
+        self.sender = sender
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[date, date, int]] = []  # (deadline, next_delivery_date, subscription_id)
+        self._day: Optional[date] = None
+        self._cursor: Optional[Tuple[date, int]] = None
+        self._exhausted = False
+
+    def schedule(self, subscription_id: int, next_delivery_date: Optional[date], cadence: Optional[str]) -> None:
+        """Queue a reminder known to the caller, e.g. right after a subscription is created."""
+        if next_delivery_date is None:
+            return
+        with self._lock:
+            heapq.heappush(self._heap, (reminder_deadline(next_delivery_date, cadence), next_delivery_date, subscription_id))
+
+    def refill(self, db: Session, today: date) -> int:
+        """Load the next window of unreminded deliveries whose reminder is due today; return rows loaded."""
+        with self._lock:
+            if self._day != today:
+                # A new day widens the window: rescan it from the start
+                self._heap, self._day, self._cursor, self._exhausted = [], today, None, False
+            room = self.capacity - len(self._heap)
+            if self._exhausted or room <= 0:
+                return 0
+            cursor = self._cursor
+        q = (
+            select(Subscription.id, Subscription.next_delivery_date, Subscription.cadence)
+            .where(
+                Subscription.status == SubscriptionStatus.active,
+                Subscription.next_delivery_date >= today,
+                Subscription.next_delivery_date <= today + MAX_LEAD,
+                due_by(today),
+                or_(Subscription.last_reminder_for.is_(None), Subscription.last_reminder_for != Subscription.next_delivery_date),
+            )
+            .order_by(Subscription.next_delivery_date, Subscription.id)
+            .limit(room)
+        )
+        if cursor is not None:
+            q = q.where(tuple_(Subscription.next_delivery_date, Subscription.id) > tuple_(*cursor))
+        rows = db.execute(q).all()
+        with self._lock:
+            for sid, next_date, cadence in rows:
+                heapq.heappush(self._heap, (reminder_deadline(next_date, cadence), next_date, sid))
+            if rows:
+                self._cursor = (rows[-1].next_delivery_date, rows[-1].id)
+            self._exhausted = len(rows) < room
+        return len(rows)
+
+    def _pop_due(self, today: date) -> List[Tuple[date, int]]:
+        due: List[Tuple[date, int]] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= today and len(due) < self.batch_size:
+                _, next_date, sid = heapq.heappop(self._heap)
+                due.append((next_date, sid))
+        return due
+
+    def dispatch(self, db: Session, due: List[Tuple[date, int]]) -> int:
+        """Send one batch: a guarded UPDATE ... RETURNING claims the rows, then only the claimed ones are sent.
+
+        Entries go stale when a subscription is renewed or rescheduled after
+        being queued, and another process may have sent the reminder already;
+        neither kind of row matches the claim.
+        """
+        claimed = db.execute(
+            update(Subscription)
+            .where(
+                tuple_(Subscription.id, Subscription.next_delivery_date).in_([(sid, next_date) for next_date, sid in due]),
+                Subscription.status == SubscriptionStatus.active,
+                or_(Subscription.last_reminder_for.is_(None), Subscription.last_reminder_for != Subscription.next_delivery_date),
+            )
+            .values(last_reminder_for=Subscription.next_delivery_date)
+            .returning(Subscription.id, Subscription.next_delivery_date, Subscription.user_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not claimed:
+            db.rollback()
+            return 0
+        emails = dict(db.execute(select(User.id, User.email).where(User.id.in_({user_id for _, _, user_id in claimed}))).all())
+        db.commit()
+        self.sender([(emails[user_id], sid, next_date) for sid, next_date, user_id in claimed])
+        return len(claimed)
+
+    def run(self, db: Session, today: Optional[date] = None) -> Dict[str, int]:
+        today = today or date.today()
+        sent = 0
+        while True:
+            self.refill(db, today)
+            due = self._pop_due(today)
+            if not due:
+                break
+            sent += self.dispatch(db, due)
+        return {"sent": sent, "queued": len(self._heap)}
+
+
+reminder_scheduler = ReminderScheduler()
+
+
+def reminder_job() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return reminder_scheduler.run(db)
+    finally:
+        db.close()
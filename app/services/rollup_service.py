@@ -0,0 +1,162 @@
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, dialect_insert
+from app.models import DailySales, DailySalesDelta, Order, OrderItem, OrderStatus, PaymentStatus
+
+TOTALS = 0  # product_id of the per-day order totals row
+COUNTERS = ("orders", "units", "revenue", "discount", "paid_orders", "paid_revenue")
+
+
+def _apply(db: Session, deltas: Dict[Tuple[date, int], Dict[str, float]]) -> None:
+    """Append the deltas for their (day, product) rows with one executemany insert.
+
+    Appending takes no lock on the shared rows (every order touches the
+    day's TOTALS row), so checkouts do not queue on each other; fold()
+    adds the deltas into daily_sales in the background.
+    """
+    if deltas:
+        db.execute(insert(DailySalesDelta), [{"day": day, "product_id": pid, **{name: 0 for name in COUNTERS}, **values} for (day, pid), values in deltas.items()])
+
+
+def fold(db: Session) -> int:
+    """Move pending deltas into daily_sales; return the deltas folded.
+
+    DELETE ... RETURNING hands back exactly the rows it removed, so a delta
+    committed meanwhile is left for the next fold rather than lost.
+    """
+    rows = db.execute(delete(DailySalesDelta).returning(DailySalesDelta.day, DailySalesDelta.product_id, *(getattr(DailySalesDelta, name) for name in COUNTERS))).all()
+    sums: Dict[Tuple[date, int], Dict[str, float]] = {}
+    for day, pid, *values in rows:
+        _add(sums, (day, pid), **dict(zip(COUNTERS, values)))
+    if sums:
+        table = DailySales.__table__
+        stmt = dialect_insert(db, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.product_id],
+            set_={name: table.c[name] + stmt.excluded[name] for name in COUNTERS},
+        )
+        db.execute(stmt, [{"day": day, "product_id": pid, **{name: 0 for name in COUNTERS}, **values} for (day, pid), values in sums.items()])
+    db.commit()
+    return len(rows)
+
+
+def fold_job() -> int:
+    db = SessionLocal()
+    try:
+        return fold(db)
+    finally:
+        db.close()
+
+
+def _load(db: Session, order_ids: List[int], *criteria):
+    orders = db.execute(
+        select(Order.id, Order.created_at, Order.total_amount, Order.discount, Order.payment_status)
+        .where(Order.id.in_(order_ids), *criteria)
+    ).all()
+    items: Dict[int, List] = {}
+    if orders:
+        for row in db.execute(select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.unit_price).where(OrderItem.order_id.in_([o.id for o in orders]))):
+            items.setdefault(row.order_id, []).append(row)
+    return orders, items
+
+
+def _add(deltas, key, **values) -> None:
+    row = deltas.setdefault(key, {})
+    for name, value in values.items():
+        row[name] = row.get(name, 0) + value
+
+
+def _record(db: Session, order_ids: Iterable[int], sign: int, sales: bool, paid: bool, *criteria) -> None:
+    orders, items = _load(db, list(order_ids), *criteria)
+    deltas: Dict[Tuple[date, int], Dict[str, float]] = {}
+    for o in orders:
+        day = o.created_at.date()
+        counted_paid = paid and (not sales or o.payment_status == PaymentStatus.paid)
+        lines = items.get(o.id, [])
+        totals = {}
+        if sales:
+            totals.update(orders=sign, units=sign * sum(i.quantity for i in lines), revenue=sign * (o.total_amount or 0.0), discount=sign * (o.discount or 0.0))
+        if counted_paid:
+            totals.update(paid_orders=sign, paid_revenue=sign * (o.total_amount or 0.0))
+        if totals:
+            _add(deltas, (day, TOTALS), **totals)
+        per_product: Dict[int, Tuple[int, float]] = {}
+        for i in lines:
+            units, revenue = per_product.get(i.product_id, (0, 0.0))
+            per_product[i.product_id] = (units + i.quantity, revenue + i.quantity * i.unit_price)
+        for pid, (units, revenue) in per_product.items():
+            values = {}
+            if sales:
+                values.update(orders=sign, units=sign * units, revenue=sign * revenue)
+            if counted_paid:
+                values.update(paid_orders=sign, paid_revenue=sign * revenue)
+            if values:
+                _add(deltas, (day, pid), **values)
+    _apply(db, deltas)
+
+
+def orders_created(db: Session, order_ids: Iterable[int]) -> None:
+    """Count new (flushed) orders; call in the creating transaction."""
+    _record(db, order_ids, 1, True, False)
+
+
+def orders_paid(db: Session, order_ids: Iterable[int]) -> None:
+    """Count a transition to paid; cancelled orders are not in the rollup and are skipped."""
+    _record(db, order_ids, 1, False, True, Order.status != OrderStatus.cancelled)
+
+
+def orders_cancelled(db: Session, order_ids: Iterable[int]) -> None:
+    """Take cancelled orders out again, including their paid figures if they had been paid."""
+    _record(db, order_ids, -1, True, True)
+
+
+def rebuild_daily_sales(db: Session) -> int:
+    """Recompute the whole rollup from orders in two set-based statements; return the rows written."""
+    table = DailySales.__table__
+    db.execute(delete(DailySalesDelta))  # already covered by the rebuild
+    db.execute(delete(table))
+    day = func.date(Order.created_at)
+    is_paid = Order.payment_status == PaymentStatus.paid
+    live = Order.status != OrderStatus.cancelled
+    units = select(OrderItem.order_id, func.sum(OrderItem.quantity).label("units")).group_by(OrderItem.order_id).subquery()
+    totals = (
+        select(
+            day, literal(TOTALS),
+            func.count(Order.id),
+            func.coalesce(func.sum(units.c.units), 0),
+            func.coalesce(func.sum(Order.total_amount), 0.0),
+            func.coalesce(func.sum(Order.discount), 0.0),
+            func.count(Order.id).filter(is_paid),
+            func.coalesce(func.sum(Order.total_amount).filter(is_paid), 0.0),
+        )
+        .select_from(Order)
+        .outerjoin(units, units.c.order_id == Order.id)
+        .where(live)
+        .group_by(day)
+    )
+    line_revenue = OrderItem.quantity * OrderItem.unit_price
+    products = (
+        select(
+            day, OrderItem.product_id,
+            func.count(func.distinct(Order.id)),
+            func.sum(OrderItem.quantity),
+            func.sum(line_revenue),
+            literal(0.0),
+            func.count(func.distinct(Order.id)).filter(is_paid),
+            func.coalesce(func.sum(line_revenue).filter(is_paid), 0.0),
+        )
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(live)
+        .group_by(day, OrderItem.product_id)
+    )
+    columns = ["day", "product_id", *COUNTERS]
+    written = 0
+    for query in (totals, products):
+        written += db.execute(insert(table).from_select(columns, query)).rowcount
+    db.commit()
+    return written
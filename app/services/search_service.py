@@ -0,0 +1,107 @@
+import re
+from typing import List
+
+from sqlalchemy import or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models import Product
+
+FTS_TABLE = "products_fts"
+
+# Weighted document used by both the Postgres GIN expression index and the
+# search query; the two must stay textually identical for the index to apply.
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(allergens::text, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(ingredients, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(feeding_guidelines, '')), 'C')"
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Create the dialect's full-text index if it does not exist yet."""
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"), {"n": FTS_TABLE}).first()
+            if exists:
+                return
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "name, ingredients, feeding_guidelines, allergens, tokenize = 'porter unicode61')"
+            ))
+            conn.execute(text(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, ingredients, feeding_guidelines, allergens) "
+                "SELECT id, name, coalesce(ingredients, ''), coalesce(feeding_guidelines, ''), coalesce(allergens, '') FROM products"
+            ))
+        elif conn.dialect.name == "postgresql":
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_products_search ON products USING GIN (({PG_DOCUMENT}))"))
+
+
+def index_product(db: Session, product: Product) -> None:
+    """Refresh one product's FTS row inside the caller's transaction (Postgres maintains its index itself)."""
+    index_products(db, [{
+        "id": product.id,
+        "name": product.name,
+        "ingredients": product.ingredients,
+        "feeding_guidelines": product.feeding_guidelines,
+        "allergens": product.allergens,
+    }])
+
+
+def index_products(db: Session, rows: List[dict]) -> None:
+    """Bulk variant of index_product for dicts carrying id, name, ingredients, feeding_guidelines and allergens."""
+    if not rows or db.get_bind().dialect.name != "sqlite":
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": r["id"]} for r in rows])
+    db.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, name, ingredients, feeding_guidelines, allergens) VALUES (:id, :name, :ingredients, :feeding, :allergens)"),
+        [
+            {
+                "id": r["id"],
+                "name": r.get("name") or "",
+                "ingredients": r.get("ingredients") or "",
+                "feeding": r.get("feeding_guidelines") or "",
+                "allergens": " ".join(r.get("allergens") or []),
+            }
+            for r in rows
+        ],
+    )
+
+
+def unindex_product(db: Session, product_id: int) -> None:
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": product_id})
+
+
+def search_product_ids(db: Session, q: str, limit: int = 20, offset: int = 0) -> List[int]:
+    """Return product ids matching q, best match first."""
+    tokens = _TOKEN_RE.findall(q or "")
+    if not tokens:
+        return []
+    dialect = db.get_bind().dialect.name
+    params = {"limit": limit, "offset": offset}
+    if dialect == "sqlite":
+        # Quote every token so user input cannot inject FTS5 query syntax; prefix-match the last one
+        terms = ['"%s"' % t.replace('"', '""') for t in tokens]
+        terms[-1] += "*"
+        params["q"] = " ".join(terms)
+        rows = db.execute(text(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q "
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 1.0, 4.0) LIMIT :limit OFFSET :offset"
+        ), params)
+        return [r[0] for r in rows]
+    if dialect == "postgresql":
+        params["q"] = " ".join(tokens)
+        rows = db.execute(text(
+            f"SELECT id FROM products WHERE ({PG_DOCUMENT}) @@ websearch_to_tsquery('english', :q) "
+            f"ORDER BY ts_rank(({PG_DOCUMENT}), websearch_to_tsquery('english', :q)) DESC, id "
+            "LIMIT :limit OFFSET :offset"
+        ), params)
+        return [r[0] for r in rows]
+    # Unindexed fallback for other backends
+    cond = [or_(Product.name.ilike(f"%{t}%"), Product.ingredients.ilike(f"%{t}%"), Product.feeding_guidelines.ilike(f"%{t}%")) for t in tokens]
+    rows = db.query(Product.id).filter(*cond).order_by(Product.name.asc()).limit(limit).offset(offset).all()
+    return [r[0] for r in rows]
@@ -0,0 +1,95 @@
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Cadence, Order, OrderItem, OrderStatus, PaymentStatus, Product, Subscription, SubscriptionStatus
+from app.services import counters_service as counters
+from app.services import rollup_service as rollup
+
+RENEWAL_CHUNK_SIZE = 1000
+
+
+def cadence_delta(cadence: Optional[str]) -> timedelta:
+    return timedelta(days=7) if cadence == Cadence.weekly else timedelta(days=30)
+
+
+def renew_due_subscriptions(db: Session, today: Optional[date] = None, after_id: int = 0, chunk_size: int = RENEWAL_CHUNK_SIZE) -> Dict:
+    """Create the orders of every active subscription due on or before today, one chunk per transaction.
+
+    Chunks are claimed by advancing next_delivery_date in one guarded UPDATE
+    ... RETURNING, so a rerun (or a concurrent one) never renews a subscription
+    twice; orders and items are then bulk inserted for the claimed rows. The
+    scan walks ids upwards, and last_id in the report resumes an interrupted run.
+    Like single renewals, these orders do not reserve stock.
+    """
+    started = time.perf_counter()
+    today = today or date.today()
+    renewed = skipped = chunks = 0
+    last_id = after_id
+    next_date = case(
+        (Subscription.cadence == Cadence.weekly, today + cadence_delta(Cadence.weekly)),
+        else_=today + cadence_delta(Cadence.monthly),
+    )
+    while True:
+        due = db.execute(
+            select(Subscription.id, Subscription.user_id, Subscription.product_id, Subscription.quantity)
+            .where(Subscription.status == SubscriptionStatus.active, Subscription.next_delivery_date <= today, Subscription.id > last_id)
+            .order_by(Subscription.id)
+            .limit(chunk_size)
+        ).all()
+        if not due:
+            break
+        last_id = due[-1].id
+        prices = dict(db.execute(select(Product.id, Product.price).where(Product.id.in_({s.product_id for s in due}))).all())
+        renewable = [s for s in due if s.product_id in prices]
+        skipped += len(due) - len(renewable)
+        claimed = set(db.execute(
+            update(Subscription)
+            .where(
+                Subscription.id.in_([s.id for s in renewable]),
+                Subscription.status == SubscriptionStatus.active,
+                Subscription.next_delivery_date <= today,
+            )
+            .values(next_delivery_date=next_date)
+            .returning(Subscription.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        subs = [s for s in renewable if s.id in claimed]
+        if subs:
+            now = datetime.utcnow()
+            order_ids = db.scalars(
+                insert(Order).returning(Order.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "user_id": s.user_id,
+                        "total_amount": prices[s.product_id] * s.quantity,
+                        "discount": 0.0,
+                        "status": OrderStatus.pending,
+                        "payment_status": PaymentStatus.unpaid,
+                        "shipping_address": None,
+                        "created_at": now,
+                    }
+                    for s in subs
+                ],
+            ).all()
+            db.execute(insert(OrderItem), [
+                {"order_id": oid, "product_id": s.product_id, "quantity": s.quantity, "unit_price": prices[s.product_id]}
+                for oid, s in zip(order_ids, subs)
+            ])
+            rollup.orders_created(db, order_ids)
+            counters.bump(db, orders=len(order_ids), revenue=sum(prices[s.product_id] * s.quantity for s in subs))
+        db.commit()
+        renewed += len(subs)
+        chunks += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "renewed": renewed,
+        "skipped": skipped,
+        "chunks": chunks,
+        "last_id": last_id,
+        "duration_ms": int(elapsed * 1000),
+        "per_second": round(renewed / elapsed, 1) if elapsed else None,
+    }
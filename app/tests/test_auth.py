@@ -2,6 +2,7 @@ import os
 from fastapi.testclient import TestClient
 
 os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+os.environ.setdefault("RATE_LIMIT_MAX", "100000")  # the suite shares one client IP
 
 from app.main import app  # noqa: E402
 
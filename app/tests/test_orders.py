@@ -0,0 +1,476 @@
+import os
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+os.environ.setdefault("RATE_LIMIT_MAX", "100000")  # the suite shares one client IP
+
+from app.main import app  # noqa: E402
+from app.database import SessionLocal
+from app.models import Product, User
+
+
+def make_admin(email: str):
+    db: Session = SessionLocal()
+    try:
+        u = db.query(User).filter(User.email == email).first()
+        if u:
+            u.role = "admin"
+            db.add(u)
+            db.commit()
+    finally:
+        db.close()
+
+
+def auth_headers(client: TestClient, email: str, password: str):
+    r = client.post("/auth/login", json={"email": email, "password": password})
+    assert r.status_code == 200, r.text
+    token = r.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def admin_client_headers(client: TestClient, email: str):
+    password = "pass12345"
+    r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+    assert r.status_code == 200, r.text
+    make_admin(email)
+    return auth_headers(client, email, password)
+
+
+def create_product(client: TestClient, headers: dict, slug: str, **fields):
+    prod = {"name": slug, "slug": slug, "price": 10.0, "stock": 10, **fields}
+    r = client.post("/products/", json=prod, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def stock_of(product_id: int) -> int:
+    db: Session = SessionLocal()
+    try:
+        return db.query(Product.stock).filter(Product.id == product_id).scalar()
+    finally:
+        db.close()
+
+
+def fold_rollup():
+    from app.services.rollup_service import fold
+
+    db: Session = SessionLocal()
+    try:
+        fold(db)
+    finally:
+        db.close()
+
+
+def test_order_stock_is_never_oversold():
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "stock-admin@example.com")
+        pid = create_product(client, headers, "stock-limited", stock=3)
+
+        # Duplicate lines for the same product are reserved together
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 2}, {"product_id": pid, "quantity": 2}]}, headers=headers)
+        assert r.status_code == 400, r.text
+        assert stock_of(pid) == 3
+
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 2}]}, headers=headers)
+        assert r.status_code == 200, r.text
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 2}]}, headers=headers)
+        assert r.status_code == 400, r.text
+        assert stock_of(pid) == 1
+
+
+def test_idempotent_order_creation():
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "idem-admin@example.com")
+        pid = create_product(client, headers, "idem-product", stock=5)
+        body = {"items": [{"product_id": pid, "quantity": 2}]}
+        keyed = {**headers, "Idempotency-Key": "order-retry-1"}
+
+        first = client.post("/orders/", json=body, headers=keyed)
+        assert first.status_code == 200, first.text
+        retry = client.post("/orders/", json=body, headers=keyed)
+        assert retry.status_code == 200, retry.text
+        assert retry.headers.get("Idempotent-Replayed") == "true"
+        assert retry.json() == first.json()
+        assert stock_of(pid) == 3
+
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 1}]}, headers=keyed)
+        assert r.status_code == 422, r.text
+
+        r = client.post(f"/payments/checkout?order_id={first.json()['id']}", headers={**headers, "Idempotency-Key": "pay-1"})
+        assert r.status_code == 200, r.text
+        again = client.post(f"/payments/checkout?order_id={first.json()['id']}", headers={**headers, "Idempotency-Key": "pay-1"})
+        assert again.json() == r.json() and again.headers.get("Idempotent-Replayed") == "true"
+
+
+def test_order_listing_query_count_is_constant():
+    from sqlalchemy import event
+    from app.database import engine
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "nplus1-admin@example.com")
+        pid = create_product(client, headers, "nplus1-product", stock=50)
+
+        statements = []
+
+        def count(*_):
+            statements.append(1)
+
+        def queries_for_listing():
+            statements.clear()
+            event.listen(engine, "before_cursor_execute", count)
+            try:
+                r = client.get("/orders/", headers=headers)
+            finally:
+                event.remove(engine, "before_cursor_execute", count)
+            assert r.status_code == 200, r.text
+            return len(statements), r.json()
+
+        client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 1}]}, headers=headers)
+        baseline, _ = queries_for_listing()
+        for _ in range(4):
+            client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 1}]}, headers=headers)
+        queries, orders = queries_for_listing()
+        assert len(orders) == 5
+        assert all(o["items"] == [{"product_id": pid, "quantity": 1, "unit_price": 10.0}] for o in orders)
+        assert queries == baseline
+
+
+def test_streaming_order_export():
+    import json
+    from datetime import datetime
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "export-admin@example.com")
+        pid = create_product(client, headers, "export-product", stock=20, price=2.5)
+        before = datetime.utcnow().isoformat()
+        ids = []
+        for qty in (1, 3):
+            r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": qty}]}, headers=headers)
+            assert r.status_code == 200, r.text
+            ids.append(r.json()["id"])
+
+        r = client.get("/admin/orders/export", params={"format": "ndjson", "from": before}, headers=headers)
+        assert r.status_code == 200, r.text
+        exported = [json.loads(line) for line in r.text.splitlines()]
+        assert [o["order_id"] for o in exported] == ids
+        assert exported[1]["items"] == [{"product_id": pid, "quantity": 3, "unit_price": 2.5}]
+
+        r = client.get("/admin/orders/export", params={"format": "csv", "from": before}, headers=headers)
+        lines = r.text.splitlines()
+        assert lines[0].startswith("order_id,user_id,created_at")
+        assert len(lines) == 3
+
+        r = client.get("/admin/orders/export", params={"to": before}, headers=headers)
+        assert all(o["order_id"] not in ids for o in map(json.loads, r.text.splitlines()))
+
+
+def test_auto_cancel_restocks_expired_unpaid_orders():
+    from datetime import datetime, timedelta
+    from app.models import Order
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "autocancel-admin@example.com")
+        pid = create_product(client, headers, "autocancel-product", stock=10)
+        stale = [client.post("/orders/", json={"items": [{"product_id": pid, "quantity": q}]}, headers=headers).json()["id"] for q in (2, 3)]
+        fresh = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 1}]}, headers=headers).json()["id"]
+        assert stock_of(pid) == 4
+
+        db: Session = SessionLocal()
+        try:
+            db.query(Order).filter(Order.id.in_(stale)).update({Order.created_at: datetime.utcnow() - timedelta(hours=2)}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+        r = client.post("/orders/auto-cancel", params={"older_than_minutes": 60}, headers=headers)
+        assert r.status_code == 200, r.text
+        assert r.json()["cancelled"] == 2
+        assert stock_of(pid) == 9
+        statuses = {oid: client.get(f"/orders/{oid}", headers=headers).json()["status"] for oid in [*stale, fresh]}
+        assert statuses == {stale[0]: "cancelled", stale[1]: "cancelled", fresh: "pending"}
+
+        r = client.post("/orders/auto-cancel", params={"older_than_minutes": 60}, headers=headers)
+        assert r.json()["cancelled"] == 0
+        assert stock_of(pid) == 9
+
+
+def test_invoice_snapshot_is_issued_at_payment():
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "invoice-admin@example.com")
+        pid = create_product(client, headers, "invoice-product", stock=10, price=4.0)
+        paid, unpaid = (client.post("/orders/", json={"items": [{"product_id": pid, "quantity": q}]}, headers=headers).json()["id"] for q in (2, 1))
+
+        r = client.post("/payments/webhook", json={"order_id": paid, "status": "paid"})
+        assert r.status_code == 200, r.text
+        r = client.get(f"/orders/{paid}/invoice", headers=headers)
+        assert r.status_code == 200, r.text
+        invoice = r.json()
+        assert invoice["payment_status"] == "paid" and invoice["total"] == 8.0
+        etag = r.headers["ETag"]
+
+        # The snapshot is immutable: later price changes and status updates do not alter it
+        client.put(f"/products/{pid}", json={"price": 99.0}, headers=headers)
+        client.patch(f"/orders/{paid}/status", json={"status": "shipped"}, headers=headers)
+        r = client.get(f"/orders/{paid}/invoice", headers={**headers, "If-None-Match": etag})
+        assert r.status_code == 304
+        assert client.get(f"/orders/{paid}/invoice", headers=headers).json() == invoice
+
+        r = client.post("/orders/invoices/batch", json={"order_ids": [paid, unpaid, 10**9]}, headers=headers)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        assert [i["order_id"] for i in body["invoices"]] == [paid, unpaid]
+        assert body["invoices"][0] == invoice
+        assert body["invoices"][1]["payment_status"] == "unpaid"
+        assert body["missing"] == [10**9]
+
+
+def test_bulk_fulfillment_updates():
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "fulfil-admin@example.com")
+        pid = create_product(client, headers, "fulfil-product", stock=20)
+        ids = [client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 1}]}, headers=headers).json()["id"] for _ in range(4)]
+        for oid in ids[:3]:
+            client.post("/payments/webhook", json={"order_id": oid, "status": "paid"})
+
+        r = client.patch("/orders/bulk-status", json={"updates": [
+            {"order_id": ids[0], "status": "shipped", "tracking_id": "TRK-0"},
+            {"order_id": ids[1], "status": "shipped", "tracking_id": "TRK-1"},
+            {"order_id": ids[2], "status": "shipped"},
+            {"order_id": ids[3], "status": "shipped", "tracking_id": "TRK-3"},
+            {"order_id": 10**9, "status": "shipped", "tracking_id": "TRK-X"},
+        ]}, headers=headers)
+        assert r.status_code == 200, r.text
+        report = r.json()
+        assert report["updated"] == 2
+        assert {f["order_id"] for f in report["failed"]} == {ids[2], ids[3], 10**9}
+
+        r = client.patch("/orders/bulk-status", json={"updates": [
+            {"order_id": ids[0], "status": "delivered"},
+            {"order_id": ids[1], "status": "shipped", "tracking_id": "TRK-1b"},
+            {"order_id": ids[1], "status": "delivered"},
+        ]}, headers=headers)
+        assert r.json()["updated"] == 2
+        assert r.json()["failed"] == [{"order_id": ids[1], "error": "Duplicate order_id in request"}]
+        first, second = (client.get(f"/orders/{oid}", headers=headers).json() for oid in ids[:2])
+        assert (first["status"], first["tracking_id"]) == ("delivered", "TRK-0")
+        assert (second["status"], second["tracking_id"]) == ("shipped", "TRK-1b")
+
+
+def test_stock_reservations_and_ledger():
+    from datetime import datetime, timedelta
+    from sqlalchemy import func
+    from app.models import InventoryMovement, Invoice, StockReservation
+    from app.services.order_service import cancel_expired_orders
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "reserve-admin@example.com")
+        pid = create_product(client, headers, "reserve-product", stock=10)
+        expiring, cancelled, paid = (client.post("/orders/", json={"items": [{"product_id": pid, "quantity": q}]}, headers=headers).json()["id"] for q in (1, 2, 3))
+        assert client.get(f"/products/{pid}/availability").json() == {"product_id": pid, "available": 4, "reserved": 6}
+
+        client.post("/payments/webhook", json={"order_id": paid, "status": "paid"})
+        assert client.get(f"/products/{pid}/availability").json()["reserved"] == 3
+        assert client.post(f"/orders/{cancelled}/cancel", headers=headers).status_code == 200
+        assert stock_of(pid) == 6
+
+        db: Session = SessionLocal()
+        try:
+            db.query(StockReservation).filter(StockReservation.order_id == expiring).update(
+                {StockReservation.expires_at: datetime.utcnow() - timedelta(minutes=1)}, synchronize_session=False
+            )
+            db.commit()
+            assert cancel_expired_orders(db)["cancelled"] == 1
+            assert db.query(func.sum(InventoryMovement.quantity)).filter(InventoryMovement.product_id == pid).scalar() == 7
+        finally:
+            db.close()
+        assert client.get(f"/orders/{expiring}", headers=headers).json()["status"] == "cancelled"
+        assert client.get(f"/products/{pid}/availability").json() == {"product_id": pid, "available": 7, "reserved": 0}
+
+        # A payment arriving after expiry does not revive the order or take stock again
+        client.post("/payments/webhook", json={"order_id": expiring, "status": "paid"})
+        late = client.get(f"/orders/{expiring}", headers=headers).json()
+        assert (late["status"], late["payment_status"]) == ("cancelled", "refund_pending")
+        client.post("/payments/webhook", json={"order_id": expiring, "status": "paid"})  # retried: still one pending refund
+        client.post("/payments/webhook", json={"order_id": expiring, "status": "refunded"})
+        assert client.get(f"/orders/{expiring}", headers=headers).json()["payment_status"] == "refunded"
+        assert stock_of(pid) == 7
+        db = SessionLocal()
+        try:
+            assert db.query(Invoice).filter(Invoice.order_id == expiring).count() == 0
+        finally:
+            db.close()
+
+
+def test_coupon_redemption_respects_max_uses_and_new_user_only():
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "coupon-admin@example.com")
+        pid = create_product(client, headers, "coupon-product", stock=10)
+        r = client.post("/coupons/", json={"code": "FLASH2", "discount_type": "percent", "discount_value": 10, "max_uses": 2, "applicable_products": [pid]}, headers=headers)
+        assert r.status_code == 200, r.text
+        client.post("/coupons/", json={"code": "WELCOME", "discount_type": "fixed", "discount_value": 5, "new_user_only": True}, headers=headers)
+
+        apply = {"code": "FLASH2", "amount": 50.0, "product_ids": [pid]}
+        assert client.post("/coupons/apply", json={**apply, "product_ids": [pid + 1000]}, headers=headers).status_code == 400
+        assert client.post("/coupons/apply", json=apply, headers=headers).json() == {"discount": 5.0}
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 2}], "coupon_code": "FLASH2"}, headers=headers)
+        assert r.json()["discount"] == 2.0
+        # Exhausted: the order still goes through, without a discount
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 1}], "coupon_code": "FLASH2"}, headers=headers)
+        assert r.status_code == 200 and r.json()["discount"] == 0.0
+        r = client.post("/coupons/apply", json=apply, headers=headers)
+        assert r.status_code == 400 and r.json()["detail"] == "Coupon usage exceeded"
+
+        assert client.post("/coupons/apply", json={"code": "WELCOME", "amount": 20.0}, headers=headers).status_code == 400
+        newcomer = admin_client_headers(client, "coupon-newcomer@example.com")
+        assert client.post("/coupons/apply", json={"code": "WELCOME", "amount": 20.0}, headers=newcomer).json() == {"discount": 5.0}
+        assert client.post("/coupons/apply", json={"code": "NOPE", "amount": 20.0}, headers=newcomer).status_code == 404
+
+
+def test_coupon_batch_generation_streams_unique_codes():
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "coupon-batch-admin@example.com")
+        r = client.post("/coupons/batch", json={"count": 4500, "prefix": "SPRING-", "length": 8, "discount_type": "fixed", "discount_value": 3}, headers=headers)
+        assert r.status_code == 200, r.text
+        lines = r.text.splitlines()
+        assert lines[0] == "code"
+        codes = lines[1:]
+        assert len(codes) == len(set(codes)) == 4500
+        assert all(c.startswith("SPRING-") and len(c) == 15 for c in codes)
+
+        # Single use by default
+        assert client.post("/coupons/apply", json={"code": codes[0], "amount": 10.0}, headers=headers).json() == {"discount": 3.0}
+        assert client.post("/coupons/apply", json={"code": codes[0], "amount": 10.0}, headers=headers).status_code == 400
+
+
+def test_high_traffic_coupon_uses_sharded_counters():
+    from app.services.coupon_service import fold_counters
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "coupon-shard-admin@example.com")
+        r = client.post("/coupons/", json={"code": "MEGA5", "discount_type": "fixed", "discount_value": 1, "max_uses": 5, "high_traffic": True, "counter_shards": 3}, headers=headers)
+        assert r.status_code == 200, r.text
+
+        results = [client.post("/coupons/apply", json={"code": "MEGA5", "amount": 10.0}, headers=headers).status_code for _ in range(7)]
+        assert results.count(200) == 5 and results.count(400) == 2
+
+        db: Session = SessionLocal()
+        try:
+            fold_counters(db)
+        finally:
+            db.close()
+        body = client.get("/coupons/validate/MEGA5").json()
+        assert body["valid"] is False and body["remaining_uses"] == 0
+
+
+def test_daily_sales_rollup_tracks_orders_and_matches_backfill():
+    from datetime import date
+    from app.models import DailySales
+    from app.services.rollup_service import rebuild_daily_sales
+
+    def product_rows(pids):
+        db: Session = SessionLocal()
+        try:
+            rows = db.query(DailySales).filter(DailySales.product_id.in_(pids)).order_by(DailySales.product_id).all()
+            return [(r.product_id, r.orders, r.units, round(r.revenue, 2), r.paid_orders, round(r.paid_revenue, 2)) for r in rows]
+        finally:
+            db.close()
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "rollup-admin@example.com")
+        a = create_product(client, headers, "rollup-a", price=2.0, stock=50)
+        b = create_product(client, headers, "rollup-b", price=5.0, stock=50)
+        today = date.today().isoformat()
+        fold_rollup()
+        before = client.get("/admin/sales-stats", params={"start_date": today, "end_date": today}, headers=headers).json()
+
+        client.post("/orders/", json={"items": [{"product_id": a, "quantity": 3}, {"product_id": b, "quantity": 1}]}, headers=headers).json()["id"]
+        paid = client.post("/orders/", json={"items": [{"product_id": b, "quantity": 2}]}, headers=headers).json()["id"]
+        dropped = client.post("/orders/", json={"items": [{"product_id": a, "quantity": 4}]}, headers=headers).json()["id"]
+        client.post("/payments/webhook", json={"order_id": paid, "status": "paid"})
+        client.post("/payments/webhook", json={"order_id": paid, "status": "paid"})  # retried webhook counts once
+        client.post(f"/orders/{dropped}/cancel", headers=headers)
+
+        fold_rollup()
+        after = client.get("/admin/sales-stats", params={"start_date": today, "end_date": today}, headers=headers).json()
+        assert after["total_orders"] - before["total_orders"] == 2
+        assert round(after["revenue"] - before["revenue"], 2) == 21.0
+        assert product_rows([a, b]) == [(a, 1, 3, 6.0, 0, 0.0), (b, 2, 3, 15.0, 1, 10.0)]
+
+        db: Session = SessionLocal()
+        try:
+            rebuild_daily_sales(db)
+        finally:
+            db.close()
+        assert product_rows([a, b]) == [(a, 1, 3, 6.0, 0, 0.0), (b, 2, 3, 15.0, 1, 10.0)]
+        series = client.get("/admin/analytics/revenue", headers=headers).json()["series"]
+        assert series[-1]["day"] == today and round(series[-1]["amount"], 2) == after["revenue"]
+
+
+def test_sales_stats_filters_species_in_sql_and_accepts_timestamps():
+    from datetime import date, datetime
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "stats-admin@example.com")
+        a = create_product(client, headers, "stats-a", price=1.0, stock=100, species_tags=["Ferret"])
+        b = create_product(client, headers, "stats-b", price=1.0, stock=100, species_tags=["ferret"])
+        c = create_product(client, headers, "stats-c", price=1.0, stock=100)
+        since = datetime.utcnow().isoformat()
+        for pid, qty in ((c, 9), (a, 5), (b, 2)):
+            client.post("/orders/", json={"items": [{"product_id": pid, "quantity": qty}]}, headers=headers)
+        dropped = client.post("/orders/", json={"items": [{"product_id": b, "quantity": 50}]}, headers=headers).json()["id"]
+        client.post(f"/orders/{dropped}/cancel", headers=headers)
+
+        today = date.today().isoformat()
+        fold_rollup()
+        by_day = client.get("/admin/sales-stats", params={"start_date": today, "end_date": today, "species": "ferret", "limit": 1}, headers=headers).json()
+        assert by_day["top_items"] == [{"name": "stats-a", "sold": 5}]
+
+        recent = client.get("/admin/sales-stats", params={"start_date": since, "species": "FERRET", "limit": 5}, headers=headers).json()
+        assert recent["total_orders"] == 3
+        assert round(recent["revenue"], 2) == 16.0
+        assert recent["top_items"] == [{"name": "stats-a", "sold": 5}, {"name": "stats-b", "sold": 2}]
+
+        assert client.get("/admin/sales-stats", params={"start_date": "yesterday"}, headers=headers).status_code == 400
+        assert client.get("/admin/sales-stats", params={"limit": 0}, headers=headers).status_code == 422
+
+
+def test_admin_status_cancel_releases_stock_and_leaves_rollup_once():
+    from datetime import date
+    from app.models import DailySales
+
+    def rollup_units(pid):
+        fold_rollup()
+        db: Session = SessionLocal()
+        try:
+            return db.query(DailySales.units).filter(DailySales.day == date.today(), DailySales.product_id == pid).scalar()
+        finally:
+            db.close()
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "status-cancel-admin@example.com")
+        pid = create_product(client, headers, "status-cancel-product", stock=5)
+        oid = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 2}]}, headers=headers).json()["id"]
+        assert (stock_of(pid), rollup_units(pid)) == (3, 2)
+
+        assert client.patch(f"/orders/{oid}/status", json={"status": "cancelled"}, headers=headers).status_code == 200
+        assert (stock_of(pid), rollup_units(pid)) == (5, 0)
+        # Cancelling again changes nothing
+        assert client.post(f"/orders/{oid}/cancel", headers=headers).status_code == 400
+        assert client.patch(f"/orders/{oid}/status", json={"status": "cancelled"}, headers=headers).status_code == 400
+        assert (stock_of(pid), rollup_units(pid)) == (5, 0)
+
+        # A cancelled order cannot be revived, so its released stock cannot be sold twice
+        for status in ("pending", "paid", "shipped", "delivered"):
+            assert client.patch(f"/orders/{oid}/status", json={"status": status}, headers=headers).status_code == 400
+        assert client.get(f"/orders/{oid}", headers=headers).json()["status"] == "cancelled"
+
+        # Forward moves follow the guarded transitions; marking paid takes the payment path
+        other = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 1}]}, headers=headers).json()["id"]
+        assert client.patch(f"/orders/{other}/status", json={"status": "shipped"}, headers=headers).status_code == 400
+        assert client.patch(f"/orders/{other}/status", json={"status": "paid"}, headers=headers).status_code == 200
+        assert client.get(f"/products/{pid}/availability").json()["reserved"] == 0
+        assert client.patch(f"/orders/{other}/status", json={"status": "pending"}, headers=headers).status_code == 400
+        assert client.patch(f"/orders/{other}/status", json={"status": "shipped"}, headers=headers).status_code == 200
+        assert client.patch(f"/orders/{other}/status", json={"status": "delivered"}, headers=headers).status_code == 200
+        assert stock_of(pid) == 4
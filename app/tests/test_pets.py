@@ -0,0 +1,89 @@
+import os
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+os.environ.setdefault("RATE_LIMIT_MAX", "100000")  # the suite shares one client IP
+
+from app.main import app  # noqa: E402
+from app.database import SessionLocal
+from app.models import User
+
+
+def make_admin(email: str):
+    db: Session = SessionLocal()
+    try:
+        u = db.query(User).filter(User.email == email).first()
+        if u:
+            u.role = "admin"
+            db.add(u)
+            db.commit()
+    finally:
+        db.close()
+
+
+def auth_headers(client: TestClient, email: str, password: str):
+    r = client.post("/auth/login", json={"email": email, "password": password})
+    assert r.status_code == 200, r.text
+    token = r.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_recommendations_skip_allergens():
+    with TestClient(app) as client:
+        email = "pets-admin@example.com"
+        password = "pass12345"
+        r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+        assert r.status_code == 200, r.text
+        make_admin(email)
+        headers = auth_headers(client, email, password)
+
+        products = [
+            {"name": "Ferret Chicken Mix", "slug": "ferret-chicken", "price": 12, "stock": 5, "species_tags": ["ferret"], "ingredients": "chicken meal, rice"},
+            {"name": "Ferret Duck Mix", "slug": "ferret-duck", "price": 14, "stock": 5, "species_tags": ["ferret"], "ingredients": "duck, pumpkin", "recommended_age": 3},
+            {"name": "Ferret Lamb Mix", "slug": "ferret-lamb", "price": 13, "stock": 0, "species_tags": ["ferret"], "ingredients": "lamb, duck"},
+            {"name": "Ferret Salmon Mix", "slug": "ferret-salmon", "price": 11, "stock": 5, "species_tags": ["ferret"], "ingredients": "salmon", "allergens": ["fish"]},
+        ]
+        ids = {}
+        for prod in products:
+            r = client.post("/products/", json=prod, headers=headers)
+            assert r.status_code == 200, r.text
+            ids[prod["slug"]] = r.json()["id"]
+
+        r = client.post("/pets/", json={"name": "Bandit", "species": "ferret", "age": 3, "allergies": ["chicken", "fish"], "preferred_ingredients": ["duck"]}, headers=headers)
+        assert r.status_code == 200, r.text
+        pet_id = r.json()["id"]
+
+        r = client.get(f"/pets/{pet_id}/recommendations", headers=headers)
+        assert r.status_code == 200, r.text
+        # Other tests may leave untagged (all-species) products behind; only look at ours
+        recs = [i for i in r.json()["items"] if i["product_id"] in ids.values()]
+        assert [i["product_id"] for i in recs] == [ids["ferret-duck"]]
+        assert "contains duck" in recs[0]["reasons"]
+
+        # Catalog writes are picked up by the index
+        r = client.put(f"/products/{ids['ferret-lamb']}", json={"stock": 4}, headers=headers)
+        assert r.status_code == 200, r.text
+        r = client.get(f"/pets/{pet_id}/recommendations", headers=headers)
+        recs = [i for i in r.json()["items"] if i["product_id"] in ids.values()]
+        assert [i["product_id"] for i in recs] == [ids["ferret-duck"], ids["ferret-lamb"]]
+
+        # A write made by another worker process never reaches this one's invalidation hook
+        from app.models import Pet, Product
+        from app.services.recommendation_service import RecommendationIndex
+
+        index = RecommendationIndex(stale_seconds=0)
+        db: Session = SessionLocal()
+        try:
+            pet = db.get(Pet, pet_id)
+            assert ids["ferret-duck"] in [i["product_id"] for i in index.recommend(db, pet, 50)]
+            other: Session = SessionLocal()
+            try:
+                other.get(Product, ids["ferret-duck"]).allergens = ["chicken"]
+                other.commit()
+            finally:
+                other.close()
+            db.expire_all()
+            assert ids["ferret-duck"] not in [i["product_id"] for i in index.recommend(db, pet, 50)]
+        finally:
+            db.close()
@@ -3,10 +3,11 @@ from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+os.environ.setdefault("RATE_LIMIT_MAX", "100000")  # the suite shares one client IP
 
 from app.main import app  # noqa: E402
 from app.database import SessionLocal
-from app.models import User
+from app.models import InventoryMovement, Product, User
 
 
 def make_admin(email: str):
@@ -66,4 +67,272 @@ def test_product_crud_and_list():
 
         # Delete product
         r = client.delete(f"/products/{created['id']}", headers=headers)
-        assert r.status_code == 200, r.text
\ No newline at end of file
+        assert r.status_code == 200, r.text
+
+
+def test_species_filter_and_pagination():
+    with TestClient(app) as client:
+        email = "species-admin@example.com"
+        password = "pass12345"
+        r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+        assert r.status_code == 200, r.text
+        make_admin(email)
+        headers = auth_headers(client, email, password)
+
+        for i in range(3):
+            prod = {"name": f"Cat Bites {i}", "slug": f"cat-bites-{i}", "price": 5 + i, "stock": 10, "species_tags": ["cat"]}
+            r = client.post("/products/", json=prod, headers=headers)
+            assert r.status_code == 200, r.text
+        r = client.post("/products/", json={"name": "Bird Seed", "slug": "bird-seed", "price": 3, "stock": 10, "species_tags": ["bird"]}, headers=headers)
+        assert r.status_code == 200, r.text
+        bird_id = r.json()["id"]
+
+        r = client.get("/products/?species=cat&sort_by=price&order=asc&page=2&page_size=2")
+        assert r.status_code == 200, r.text
+        assert [p["slug"] for p in r.json()] == ["cat-bites-2"]
+
+        # Retagging moves the product between species filters
+        r = client.put(f"/products/{bird_id}", json={"species_tags": ["cat"]}, headers=headers)
+        assert r.status_code == 200, r.text
+        r = client.get("/products/?species=cat&page_size=10")
+        assert "bird-seed" in [p["slug"] for p in r.json()]
+        r = client.get("/products/?species=bird")
+        assert r.json() == []
+
+
+def test_cursor_pagination():
+    with TestClient(app) as client:
+        email = "cursor-admin@example.com"
+        password = "pass12345"
+        r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+        assert r.status_code == 200, r.text
+        make_admin(email)
+        headers = auth_headers(client, email, password)
+
+        for i in range(5):
+            prod = {"name": f"Fish Flakes {i}", "slug": f"fish-flakes-{i}", "price": 2.5, "stock": 10, "species_tags": ["fish"]}
+            r = client.post("/products/", json=prod, headers=headers)
+            assert r.status_code == 200, r.text
+
+        seen = []
+        r = client.get("/products/?species=fish&sort_by=price&order=asc&limit=2")
+        while True:
+            assert r.status_code == 200, r.text
+            seen += [p["slug"] for p in r.json()]
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            r = client.get(f"/products/?species=fish&sort_by=price&order=asc&limit=2&after={cursor}")
+        assert sorted(seen) == [f"fish-flakes-{i}" for i in range(5)]
+        assert len(seen) == len(set(seen))
+
+        r = client.get("/products/?sort_by=stock&limit=2&after=not-a-cursor")
+        assert r.status_code == 400
+
+
+def test_product_cache_invalidated_by_writes():
+    with TestClient(app) as client:
+        email = "cache-admin@example.com"
+        password = "pass12345"
+        r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+        assert r.status_code == 200, r.text
+        make_admin(email)
+        headers = auth_headers(client, email, password)
+
+        r = client.post("/products/", json={"name": "Hay Cubes", "slug": "hay-cubes", "price": 4.0, "stock": 3, "species_tags": ["rabbit"]}, headers=headers)
+        assert r.status_code == 200, r.text
+        pid = r.json()["id"]
+
+        before = client.get("/admin/cache-stats", headers=headers).json()["catalog"]
+        assert client.get(f"/products/{pid}").json()["stock"] == 3
+        assert client.get(f"/products/{pid}").json()["stock"] == 3
+        after = client.get("/admin/cache-stats", headers=headers).json()["catalog"]
+        assert after["hits"] == before["hits"] + 1
+        assert client.get("/products/?species=rabbit").json()[0]["stock"] == 3
+
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 2}]}, headers=headers)
+        assert r.status_code == 200, r.text
+        assert client.get(f"/products/{pid}").json()["stock"] == 1
+        assert client.get("/products/?species=rabbit").json()[0]["stock"] == 1
+
+        r = client.put(f"/products/{pid}", json={"price": 4.5}, headers=headers)
+        assert r.status_code == 200, r.text
+        assert client.get("/products/?species=rabbit").json()[0]["price"] == 4.5
+
+
+def test_full_text_search():
+    with TestClient(app) as client:
+        email = "search-admin@example.com"
+        password = "pass12345"
+        r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+        assert r.status_code == 200, r.text
+        make_admin(email)
+        headers = auth_headers(client, email, password)
+
+        r = client.post("/products/", json={"name": "Salmon Supreme", "slug": "salmon-supreme", "price": 20, "ingredients": "salmon, sweet potato, peas"}, headers=headers)
+        assert r.status_code == 200, r.text
+        salmon_id = r.json()["id"]
+        r = client.post("/products/", json={"name": "Turkey Dinner", "slug": "turkey-dinner", "price": 18, "ingredients": "turkey, rice", "allergens": ["grain"]}, headers=headers)
+        assert r.status_code == 200, r.text
+        turkey_id = r.json()["id"]
+
+        r = client.get("/products/search?q=sweet potato")
+        assert r.status_code == 200, r.text
+        assert [p["id"] for p in r.json()] == [salmon_id]
+        assert [p["id"] for p in client.get("/products/search?q=grain").json()] == [turkey_id]
+
+        r = client.put(f"/products/{salmon_id}", json={"name": "Ocean Feast"}, headers=headers)
+        assert r.status_code == 200, r.text
+        assert [p["id"] for p in client.get("/products/search?q=ocean").json()] == [salmon_id]
+
+        r = client.delete(f"/products/{turkey_id}", headers=headers)
+        assert r.status_code == 200, r.text
+        assert client.get("/products/search?q=turkey").json() == []
+        assert client.get('/products/search?q="unbalanced').status_code == 200
+
+
+def test_bulk_import_and_export():
+    with TestClient(app) as client:
+        email = "bulk-admin@example.com"
+        password = "pass12345"
+        r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+        assert r.status_code == 200, r.text
+        make_admin(email)
+        headers = auth_headers(client, email, password)
+
+        body = (
+            "slug,name,price,stock,species_tags,ingredients\n"
+            "bulk-a,Bulk A,3.5,7,dog|cat,\"oats,\nbarley\"\n"
+            "bulk-b,Bulk B,not-a-price,1,dog,\n"
+            "bulk-c,Bulk C,4,2,hamster,sunflower kernels\n"
+        )
+        r = client.post("/admin/products/import?format=csv", content=body.encode(), headers=headers)
+        assert r.status_code == 200, r.text
+        report = r.json()
+        assert report["upserted"] == 2 and report["failed"] == 1
+        assert report["errors"][0]["line"] == 4 and report["errors"][0]["slug"] == "bulk-b"
+
+        ndjson = '{"slug": "bulk-a", "name": "Bulk A v2", "price": 3.75, "species_tags": ["cat"]}\nnot json\n'
+        r = client.post("/admin/products/import?format=ndjson", content=ndjson.encode(), headers=headers)
+        assert r.status_code == 200, r.text
+        assert r.json()["upserted"] == 1 and r.json()["errors"][0]["line"] == 2
+
+        assert [p["name"] for p in client.get("/products/?species=cat&min_price=3.6&max_price=3.8").json()] == ["Bulk A v2"]
+        assert client.get("/products/?species=hamster").json()[0]["slug"] == "bulk-c"
+        assert client.get("/products/search?q=sunflower").json()[0]["slug"] == "bulk-c"
+
+        # Imported stock changes are in the ledger: a receipt, then the re-import's adjustment to the default 0
+        db: Session = SessionLocal()
+        try:
+            rows = db.query(InventoryMovement.reason, InventoryMovement.quantity).join(Product, Product.id == InventoryMovement.product_id)\
+                .filter(Product.slug == "bulk-a").order_by(InventoryMovement.id).all()
+        finally:
+            db.close()
+        assert [tuple(r) for r in rows] == [("receipt", 7), ("adjustment", -7)]
+
+        r = client.get("/admin/products/export?format=ndjson", headers=headers)
+        assert r.status_code == 200, r.text
+        slugs = [line for line in r.text.splitlines() if '"bulk-' in line]
+        assert len(slugs) == 2
+        r = client.get("/admin/products/export?format=csv", headers=headers)
+        assert r.text.splitlines()[0].startswith("name,slug,")
+
+
+def test_review_aggregates():
+    with TestClient(app) as client:
+        email = "review-admin@example.com"
+        password = "pass12345"
+        r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+        assert r.status_code == 200, r.text
+        make_admin(email)
+        headers = auth_headers(client, email, password)
+
+        r = client.post("/products/", json={"name": "Gecko Crickets", "slug": "gecko-crickets", "price": 6, "species_tags": ["gecko"]}, headers=headers)
+        assert r.status_code == 200, r.text
+        pid = r.json()["id"]
+        assert r.json()["rating_count"] == 0
+
+        review_ids = []
+        for rating in (5, 4, 2):
+            r = client.post(f"/products/{pid}/reviews", json={"rating": rating}, headers=headers)
+            assert r.status_code == 200, r.text
+            review_ids.append(r.json()["id"])
+        assert client.get(f"/products/{pid}").json()["rating_count"] == 0
+
+        for rid in review_ids:
+            assert client.patch(f"/products/reviews/{rid}/approve", headers=headers).status_code == 200
+        client.patch(f"/products/reviews/{review_ids[0]}/approve", headers=headers)  # idempotent
+        product = client.get(f"/products/{pid}").json()
+        assert product["rating_count"] == 3
+        assert abs(product["rating_avg"] - 11 / 3) < 1e-9
+        assert product["rating_histogram"] == {"1": 0, "2": 1, "3": 0, "4": 1, "5": 1}
+
+        r = client.delete(f"/products/reviews/{review_ids[2]}", headers=headers)
+        assert r.status_code == 200, r.text
+        product = client.get("/products/?species=gecko&sort_by=rating_avg").json()[0]
+        assert product["rating_count"] == 2 and product["rating_avg"] == 4.5
+
+
+def test_product_facets():
+    with TestClient(app) as client:
+        email = "facet-admin@example.com"
+        password = "pass12345"
+        r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+        assert r.status_code == 200, r.text
+        make_admin(email)
+        headers = auth_headers(client, email, password)
+
+        for slug, price, tags, sub in [("facet-1", 8, ["axolotl"], True), ("facet-2", 30, ["axolotl", "newt"], False), ("facet-3", 12, ["newt"], True)]:
+            r = client.post("/products/", json={"name": slug, "slug": slug, "price": price, "species_tags": tags, "subscription_available": sub}, headers=headers)
+            assert r.status_code == 200, r.text
+
+        r = client.get("/products/facets?species=axolotl")
+        assert r.status_code == 200, r.text
+        facets = r.json()
+        assert facets["total"] == 2
+        assert {"value": "newt", "count": 2} in facets["species"]
+        bands = {b["value"]: b["count"] for b in facets["price_bands"]}
+        assert bands["0-10"] >= 1 and bands["25-50"] >= 1
+        assert {f["value"]: f["count"] for f in facets["subscription_available"]} == {True: 1, False: 1}
+
+        r = client.get("/products/facets?species=newt&min_price=10&max_price=20")
+        facets = r.json()
+        assert facets["total"] == 1
+        assert {f["value"]: f["count"] for f in facets["subscription_available"]} == {True: 1}
+
+
+def test_delete_product_with_foreign_keys_enforced():
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from app.database import DATABASE_URL, get_db
+
+    fk_engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    event.listen(fk_engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+    FkSession = sessionmaker(bind=fk_engine, autoflush=False, autocommit=False)
+
+    def fk_db():
+        db = FkSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = fk_db
+    try:
+        with TestClient(app) as client:
+            email = "fk-admin@example.com"
+            password = "pass12345"
+            client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+            make_admin(email)
+            headers = auth_headers(client, email, password)
+            r = client.post("/products/", json={"name": "FK Kibble", "slug": "fk-kibble", "price": 3, "stock": 4}, headers=headers)
+            assert r.status_code == 200, r.text
+            pid = r.json()["id"]
+            assert client.get(f"/products/{pid}/availability").status_code == 200
+
+            r = client.delete(f"/products/{pid}", headers=headers)
+            assert r.status_code == 200, r.text
+            assert client.get(f"/products/{pid}").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        fk_engine.dispose()
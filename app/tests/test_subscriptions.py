@@ -0,0 +1,213 @@
+import os
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+os.environ.setdefault("RATE_LIMIT_MAX", "100000")  # the suite shares one client IP
+
+from app.main import app  # noqa: E402
+from app.database import SessionLocal
+from app.models import Subscription, User
+
+
+def make_admin(email: str):
+    db: Session = SessionLocal()
+    try:
+        u = db.query(User).filter(User.email == email).first()
+        if u:
+            u.role = "admin"
+            db.add(u)
+            db.commit()
+    finally:
+        db.close()
+
+
+def auth_headers(client: TestClient, email: str, password: str):
+    r = client.post("/auth/login", json={"email": email, "password": password})
+    assert r.status_code == 200, r.text
+    token = r.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def admin_client_headers(client: TestClient, email: str):
+    password = "pass12345"
+    r = client.post("/auth/register", json={"email": email, "full_name": "Admin", "password": password})
+    assert r.status_code == 200, r.text
+    make_admin(email)
+    return auth_headers(client, email, password)
+
+
+def set_next_delivery(sub_ids, when: date):
+    db: Session = SessionLocal()
+    try:
+        db.query(Subscription).filter(Subscription.id.in_(sub_ids)).update({Subscription.next_delivery_date: when}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_batch_renewal_of_due_subscriptions():
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "renew-admin@example.com")
+        r = client.post("/products/", json={"name": "Renew Kibble", "slug": "renew-kibble", "price": 7.5, "stock": 100}, headers=headers)
+        pid = r.json()["id"]
+        pet_id = client.post("/pets/", json={"name": "Rex", "species": "dog"}, headers=headers).json()["id"]
+        weekly, monthly, later = (
+            client.post("/subscriptions/", json={"pet_id": pet_id, "product_id": pid, "quantity": qty, "cadence": cadence}, headers=headers).json()["id"]
+            for qty, cadence in ((2, "weekly"), (1, "monthly"), (1, "weekly"))
+        )
+        today = date.today()
+        set_next_delivery([weekly, monthly], today - timedelta(days=1))
+
+        r = client.post("/subscriptions/renew-due", headers=headers)
+        assert r.status_code == 200, r.text
+        assert r.json()["renewed"] == 2
+
+        orders = client.get("/orders/", headers=headers).json()
+        assert sorted(o["total_amount"] for o in orders) == [7.5, 15.0]
+        subs = {s["id"]: s["next_delivery_date"] for s in client.get("/subscriptions/", headers=headers).json()}
+        assert subs[weekly] == str(today + timedelta(days=7))
+        assert subs[monthly] == str(today + timedelta(days=30))
+        assert subs[later] == str(today + timedelta(days=7))
+
+        # Nothing is due any more, so a rerun renews nothing twice
+        assert client.post("/subscriptions/renew-due", headers=headers).json()["renewed"] == 0
+
+
+def test_reminders_are_sent_once_per_delivery_across_restarts():
+    from app.services.reminder_service import ReminderScheduler, reminder_scheduler
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "remind-admin@example.com")
+        pid = client.post("/products/", json={"name": "Remind Kibble", "slug": "remind-kibble", "price": 5, "stock": 10}, headers=headers).json()["id"]
+        pet_id = client.post("/pets/", json={"name": "Tom", "species": "cat"}, headers=headers).json()["id"]
+        sub_id = client.post("/subscriptions/", json={"pet_id": pet_id, "product_id": pid, "quantity": 1, "cadence": "weekly"}, headers=headers).json()["id"]
+        today = date.today()
+
+        sent = []
+
+        def run_scheduler(scheduler):
+            db: Session = SessionLocal()
+            try:
+                scheduler.run(db, today)
+            finally:
+                db.close()
+            return [(s, d) for _, s, d in sent if s == sub_id]
+
+        # Delivery a week out: the weekly reminder is not due yet
+        default_sender, reminder_scheduler.sender = reminder_scheduler.sender, sent.extend
+        try:
+            assert run_scheduler(reminder_scheduler) == []
+
+            # Monthly reminders go out five days ahead, so switching cadence makes it due now
+            set_next_delivery([sub_id], today + timedelta(days=4))
+            client.patch(f"/subscriptions/{sub_id}", json={"cadence": "monthly"}, headers=headers)
+            assert run_scheduler(reminder_scheduler) == [(sub_id, today + timedelta(days=4))]
+        finally:
+            reminder_scheduler.sender = default_sender
+        # A restarted scheduler rebuilds its heap from the database and does not resend
+        assert run_scheduler(ReminderScheduler(sender=sent.extend)) == [(sub_id, today + timedelta(days=4))]
+
+        set_next_delivery([sub_id], today + timedelta(days=2))
+        assert run_scheduler(ReminderScheduler(sender=sent.extend))[-1] == (sub_id, today + timedelta(days=2))
+
+
+def test_reminder_window_holds_only_due_entries_and_claims_are_exclusive():
+    from app.services.reminder_service import ReminderScheduler
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "remind-window-admin@example.com")
+        pid = client.post("/products/", json={"name": "Window Kibble", "slug": "window-kibble", "price": 5, "stock": 10}, headers=headers).json()["id"]
+        pet_id = client.post("/pets/", json={"name": "Ivy", "species": "dog"}, headers=headers).json()["id"]
+        weekly_a, weekly_b, monthly = (
+            client.post("/subscriptions/", json={"pet_id": pet_id, "product_id": pid, "quantity": 1, "cadence": cadence}, headers=headers).json()["id"]
+            for cadence in ("weekly", "weekly", "monthly")
+        )
+        today = date.today()
+        set_next_delivery([weekly_a, weekly_b], today + timedelta(days=3))
+        set_next_delivery([monthly], today + timedelta(days=4))
+
+        sent = []
+        db: Session = SessionLocal()
+        try:
+            # Weekly deliveries three days out are not due and must not crowd out the monthly one
+            ReminderScheduler(sender=sent.extend, capacity=2).run(db, today)
+            assert [s for _, s, _ in sent if s in (weekly_a, weekly_b, monthly)] == [monthly]
+
+            # Two processes holding the same entry: only one claims and sends it
+            set_next_delivery([weekly_a], today + timedelta(days=1))
+            first, second = [], []
+            due = [(today + timedelta(days=1), weekly_a)]
+            assert ReminderScheduler(sender=first.extend).dispatch(db, due) == 1
+            assert ReminderScheduler(sender=second.extend).dispatch(db, due) == 0
+            assert [s for _, s, _ in first] == [weekly_a] and second == []
+        finally:
+            db.close()
+
+
+def test_demand_forecast_projects_subscription_and_order_demand():
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "forecast-admin@example.com")
+        pid = client.post("/products/", json={"name": "Forecast Kibble", "slug": "forecast-kibble", "price": 4, "stock": 30}, headers=headers).json()["id"]
+        pet_id = client.post("/pets/", json={"name": "Max", "species": "dog"}, headers=headers).json()["id"]
+        sub_id = client.post("/subscriptions/", json={"pet_id": pet_id, "product_id": pid, "quantity": 2, "cadence": "weekly"}, headers=headers).json()["id"]
+        set_next_delivery([sub_id], date.today())
+        # 28 units over the trailing 28 days: 1/day, of which the weekly subscription explains 2/7
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 28}]}, headers=headers)
+        assert r.status_code == 200, r.text
+
+        r = client.get("/admin/analytics/demand-forecast", params={"weeks": 2}, headers=headers)
+        assert r.status_code == 200, r.text
+        item = next(i for i in r.json()["items"] if i["product_id"] == pid)
+        assert item["subscription_units"] == 4  # deliveries today and in a week
+        assert item["one_off_units_per_day"] == round(1 - 2 / 7, 3)
+        assert item["projected_units"] == round(4 + (1 - 2 / 7) * 14, 1)
+        assert item["stock"] == 2
+        assert item["coverage_days"] == round(2 / (item["projected_units"] / 14), 1)
+
+
+def test_overview_counters_follow_writes_and_match_a_recount():
+    from app.services import counters_service as counters
+
+    def fold_counters():
+        db: Session = SessionLocal()
+        try:
+            counters.fold(db)
+        finally:
+            db.close()
+
+    with TestClient(app) as client:
+        headers = admin_client_headers(client, "overview-admin@example.com")
+        fold_counters()
+        before = client.get("/admin/analytics/overview", headers=headers).json()
+        pid = client.post("/products/", json={"name": "Overview Kibble", "slug": "overview-kibble", "price": 4.0, "stock": 50}, headers=headers).json()["id"]
+        pet_id = client.post("/pets/", json={"name": "Tally", "species": "cat"}, headers=headers).json()["id"]
+        sub_id = client.post("/subscriptions/", json={"pet_id": pet_id, "product_id": pid, "quantity": 1, "cadence": "weekly"}, headers=headers).json()["id"]
+        paused = client.post("/subscriptions/", json={"pet_id": pet_id, "product_id": pid, "quantity": 1, "cadence": "monthly"}, headers=headers).json()["id"]
+        assert client.patch(f"/subscriptions/{paused}", json={"status": "paused"}, headers=headers).status_code == 200
+        r = client.post("/orders/", json={"items": [{"product_id": pid, "quantity": 3}]}, headers=headers)
+        assert r.status_code == 200, r.text
+        assert client.delete(f"/subscriptions/{sub_id}", headers=headers).status_code == 200
+
+        # Writes only append deltas; the overview moves once they are folded
+        fold_counters()
+        after = client.get("/admin/analytics/overview", headers=headers).json()
+        assert after["products"] == before["products"] + 1
+        assert after["total_orders"] == before["total_orders"] + 1
+        assert round(after["revenue"] - before["revenue"], 2) == 12.0
+        assert after["total_subscriptions"] == before["total_subscriptions"] + 1
+        assert after["active_subscriptions"] == before["active_subscriptions"]
+
+        db: Session = SessionLocal()
+        try:
+            fresh = counters.recount(db)
+            db.rollback()
+        finally:
+            db.close()
+        assert after["total_users"] == fresh["users"]
+        assert after["total_orders"] == fresh["orders"]
+        assert round(after["revenue"], 2) == round(fresh["revenue"], 2)
+        assert after["products"] == fresh["products"]
+        assert after["active_subscriptions"] == fresh["active_subscriptions"]
+        assert after["total_subscriptions"] == fresh["total_subscriptions"]
@@ -1,8 +1,14 @@
+import base64
+import json
 import os
+import threading
 import time
-from typing import Optional, Dict
-from fastapi import FastAPI, Request
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, Iterable, Optional, Dict, Set, Tuple, List
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
+from sqlalchemy import DateTime, and_, or_
 from starlette.middleware.cors import CORSMiddleware
 
 
@@ -64,10 +70,114 @@ def add_rate_limiter(app: FastAPI):
         return await call_next(request)
 
 
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and tag-based invalidation."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = ()) -> None:
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_tags(self, *tags: str) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
 def global_exception_handler(_: Request, exc: Exception):
     return JSONResponse(status_code=500, content={"detail": "Internal Server Error", "error": str(exc)})
 
 
+def encode_cursor(values: dict) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=lambda v: v.isoformat())
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_page(q, sort_col, id_col, descending: bool, after: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """Return one page of q ordered by (sort_col, id_col) plus the cursor for the next page.
+
+    The cursor encodes the last row's sort key, so every page is a single
+    index range scan no matter how deep the client has paged.
+    """
+    if after:
+        cursor = decode_cursor(after)
+        if cursor.get("k") != sort_col.key or cursor.get("d") != descending or "id" not in cursor:
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        value = cursor.get("v")
+        if value is not None and isinstance(sort_col.type, DateTime):
+            value = datetime.fromisoformat(value)
+        last_id = cursor["id"]
+        if descending:
+            q = q.filter(or_(sort_col < value, and_(sort_col == value, id_col < last_id)))
+        else:
+            q = q.filter(or_(sort_col > value, and_(sort_col == value, id_col > last_id)))
+    q = q.order_by(sort_col.desc(), id_col.desc()) if descending else q.order_by(sort_col.asc(), id_col.asc())
+    rows = q.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor({"k": sort_col.key, "d": descending, "v": getattr(last, sort_col.key), "id": getattr(last, id_col.key)})
+    return rows, next_cursor
+
+
 def suggest_portion_and_meal(weight: Optional[float], activity_level: Optional[str]) -> Dict[str, str]:
     if not weight:
         return {"portion": "N/A", "meal_type": "balanced"}
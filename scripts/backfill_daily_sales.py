@@ -0,0 +1,17 @@
+import sys
+from app.database import SessionLocal
+from app.services.rollup_service import rebuild_daily_sales
+
+
+def main() -> int:
+    db = SessionLocal()
+    try:
+        rows = rebuild_daily_sales(db)
+        print(f"daily_sales rebuilt: {rows} rows")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
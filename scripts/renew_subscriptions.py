@@ -0,0 +1,20 @@
+import json
+import sys
+from app.database import SessionLocal
+from app.services.subscription_service import renew_due_subscriptions
+
+
+def main(after_id: int = 0) -> int:
+    db = SessionLocal()
+    try:
+        report = renew_due_subscriptions(db, after_id=after_id)
+        print(json.dumps(report))
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # Pass the last_id of an interrupted run to resume after it
+    after_id = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    sys.exit(main(after_id))